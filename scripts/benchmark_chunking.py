@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Benchmark the token-aware chunker against the previous string-building chunker
+
+Usage:
+    python scripts/benchmark_chunking.py                 # synthetic policy text
+    python scripts/benchmark_chunking.py document.txt    # your own extracted text
+"""
+import os
+import sys
+import time
+import random
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from chunking import Chunker, count_tokens
+
+
+def legacy_chunk(text):
+    """The chunker that used to live in create_document_embeddings"""
+    chunks = []
+    for paragraph in text.split("\n\n"):
+        if len(paragraph) > 800:
+            sentences = paragraph.split(". ")
+            current_chunk = ""
+            for sentence in sentences:
+                if len(current_chunk + sentence) < 800:
+                    current_chunk += sentence + ". "
+                else:
+                    if current_chunk.strip():
+                        chunks.append(current_chunk.strip())
+                    current_chunk = sentence + ". "
+            if current_chunk.strip():
+                chunks.append(current_chunk.strip())
+        elif paragraph.strip():
+            chunks.append(paragraph.strip())
+    return [chunk for chunk in chunks if len(chunk) > 50]
+
+
+def wrap_lines(text, width=90):
+    """Hard-wrap text the way PDF extraction returns it"""
+    lines, current = [], ""
+    for word in text.split(" "):
+        if current and len(current) + len(word) + 1 > width:
+            lines.append(current)
+            current = word
+        else:
+            current = f"{current} {word}" if current else word
+    lines.append(current)
+    return "\n".join(lines)
+
+
+def synthetic_policy(paragraphs, seed=42, wrapped=False):
+    random.seed(seed)
+    words = ("the insured person policy sum insured hospitalisation expenses waiting period "
+             "pre-existing disease grace period premium renewal exclusion benefit claim").split()
+    parts = []
+    for i in range(paragraphs):
+        if i % 10 == 0:
+            parts.append(f"{i // 10 + 1}. SECTION {i // 10 + 1} DEFINITIONS")
+        sentences = [" ".join(random.choices(words, k=random.randint(6, 30))).capitalize() + "."
+                     for _ in range(random.randint(1, 40))]
+        paragraph = " ".join(sentences)
+        parts.append(wrap_lines(paragraph) if wrapped else paragraph)
+    return "\n\n".join(parts)
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def run_new(text):
+    chunker = Chunker()
+    return chunker.feed(text) + chunker.finish()
+
+
+if __name__ == "__main__":
+    print("🚀 Chunking benchmark")
+    print("=" * 80)
+    if len(sys.argv) > 1:
+        with open(sys.argv[1], encoding='utf-8') as f:
+            corpora = [(os.path.basename(sys.argv[1]), f.read())]
+    else:
+        corpora = [(f"synthetic x{n}", synthetic_policy(n)) for n in (100, 1000, 5000)]
+        corpora += [(f"wrapped x{n}", synthetic_policy(n, wrapped=True)) for n in (1000, 5000)]
+
+    # "max tok" matters: anything past the encoder's 512-token window is silently truncated
+    print(f"{'corpus':<16}{'chars':>12}{'legacy s':>10}{'new s':>8}{'chunks old/new':>16}"
+          f"{'max tok old/new':>17}")
+    for name, text in corpora:
+        old_chunks, old_time = timed(legacy_chunk, text)
+        new_chunks, new_time = timed(run_new, text)
+        old_max = max((count_tokens(chunk) for chunk in old_chunks), default=0)
+        new_max = max((count_tokens(chunk) for _, _, chunk in new_chunks), default=0)
+        print(f"{name:<16}{len(text):>12,}{old_time:>10.3f}{new_time:>8.3f}"
+              f"{len(old_chunks):>8}/{len(new_chunks):<7}{old_max:>9}/{new_max:<7}")
+    print("=" * 80)
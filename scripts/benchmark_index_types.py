@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Recall vs latency of the index structures chosen by vector_index.build_index
+
+For each corpus size, builds every index type (NumPy brute force, flat
+scan, HNSW, IVF-PQ) over the same normalized vectors and sweeps the
+search-time knobs (efSearch for HNSW, nprobe for IVF-PQ). Recall@k is
+measured against exact fp32 cosine search.
+
+Usage:
+    python scripts/benchmark_index_types.py                  # 1k, 20k and 100k synthetic vectors
+    python scripts/benchmark_index_types.py 5000 50000       # custom corpus sizes
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from vector_index import build_index, search, set_search_params, index_memory_bytes, choose_index_type
+from benchmark_vector_index import synthetic_embeddings, exact_top_k
+
+K = 5
+NUM_QUERIES = 200
+DIMENSION = 768  # Smaller than bge-large to keep the large corpora quick to build
+EF_SEARCH_SWEEP = (16, 64, 256)
+NPROBE_SWEEP = (4, 16, 64)  # With the default IVF_REFINE_FACTOR re-ranking
+
+
+def measure(index, queries, truth):
+    start = time.perf_counter()
+    _, found = search(index, queries, K)
+    latency = (time.perf_counter() - start) / len(queries) * 1000
+    recall = np.mean([len(set(t) & set(f)) / K for t, f in zip(truth, found)])
+    return recall, latency
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [1000, 20000, 100000]
+    rng = np.random.RandomState(2)
+    for count in sizes:
+        vectors = synthetic_embeddings(count, DIMENSION, clusters=max(10, count // 100))
+        queries = vectors[rng.choice(count, NUM_QUERIES, replace=False)]
+        queries = queries + 0.05 * rng.randn(*queries.shape).astype(np.float32)
+        truth = exact_top_k(vectors, queries, K)
+
+        print(f"\n{count} vectors x {DIMENSION} dims (auto picks '{choose_index_type(count, 'auto')}'), recall@{K}")
+        print(f"{'index':<8} {'param':<12} {'memory MB':>10} {'build s':>8} {'recall':>8} {'ms/query':>9}")
+        for kind in ('numpy', 'flat', 'hnsw', 'ivfpq'):
+            if kind == 'numpy' and count > 20000:
+                continue  # fp32 brute force is only meant for small documents
+            if kind == 'ivfpq' and count < 10000:
+                continue  # Too few vectors to train the product quantizer
+            start = time.perf_counter()
+            index, _ = build_index(vectors.copy(), 'fp16', kind)
+            build_time = time.perf_counter() - start
+            memory = index_memory_bytes(index) / 1e6
+
+            if kind == 'hnsw':
+                sweep = [(f"efSearch={ef}", {'ef_search': ef}) for ef in EF_SEARCH_SWEEP]
+            elif kind == 'ivfpq':
+                sweep = [(f"nprobe={n}", {'nprobe': n}) for n in NPROBE_SWEEP]
+            else:
+                sweep = [("exact", {})]
+            for label, params in sweep:
+                set_search_params(index, **params)
+                recall, latency = measure(index, queries, truth)
+                print(f"{kind:<8} {label:<12} {memory:>10.1f} {build_time:>8.2f} {recall:>8.3f} {latency:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Benchmark memory and recall of the chunk vector storage modes
+
+Compares the previous fp32 IndexFlatL2 + raw embeddings array against the
+normalized fp16 and int8 scalar-quantizer indexes. Recall is measured
+against exact fp32 cosine search on the same vectors.
+
+Usage:
+    python scripts/benchmark_vector_index.py                   # synthetic bge-sized vectors
+    python scripts/benchmark_vector_index.py embeddings.npy    # your own chunk embeddings
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from vector_index import build_index, search, index_memory_bytes
+
+K = 5
+NUM_QUERIES = 200
+
+
+def synthetic_embeddings(n=20000, dimension=1024, clusters=200, seed=1):
+    """Clustered unit vectors, roughly like chunk embeddings of related policies"""
+    rng = np.random.RandomState(seed)
+    centers = rng.randn(clusters, dimension).astype(np.float32)
+    vectors = centers[rng.randint(0, clusters, n)] + 0.6 * rng.randn(n, dimension).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def exact_top_k(vectors, queries, k):
+    vectors = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    queries = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+    return np.argsort(-(queries @ vectors.T), axis=1)[:, :k]
+
+
+def main():
+    if len(sys.argv) > 1:
+        embeddings = np.load(sys.argv[1]).astype(np.float32)
+    else:
+        embeddings = synthetic_embeddings()
+    rng = np.random.RandomState(2)
+    queries = embeddings[rng.choice(len(embeddings), NUM_QUERIES, replace=False)]
+    queries = queries + 0.05 * rng.randn(*queries.shape).astype(np.float32)
+    truth = exact_top_k(embeddings, queries, K)
+
+    print(f"{len(embeddings)} vectors x {embeddings.shape[1]} dims, {NUM_QUERIES} queries, recall@{K}")
+    print(f"{'storage':<8} {'memory MB':>10} {'vs flat':>8} {'recall':>8} {'build s':>8} {'search ms/q':>12}")
+    baseline = None
+    for storage in ('flat', 'fp16', 'int8'):
+        start = time.perf_counter()
+        index, kept = build_index(embeddings.copy(), storage)
+        build_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        _, found = search(index, queries, K)
+        search_time = (time.perf_counter() - start) / NUM_QUERIES * 1000
+
+        memory = index_memory_bytes(index, kept)
+        baseline = baseline or memory
+        recall = np.mean([len(set(t) & set(f)) / K for t, f in zip(truth, found)])
+        print(f"{storage:<8} {memory / 1e6:>10.1f} {memory / baseline:>7.2f}x {recall:>8.3f} "
+              f"{build_time:>8.2f} {search_time:>12.3f}")
+
+
+if __name__ == "__main__":
+    main()
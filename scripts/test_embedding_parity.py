@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Parity test for the CPU-optimized embedding backends
+
+Encodes a set of policy clauses and questions with the fp32 PyTorch model and
+with a candidate backend (torch-int8, onnx or onnx-int8), then checks that
+retrieval returns (nearly) the same top-k clauses for every question.
+
+Usage:
+    python scripts/test_embedding_parity.py              # checks onnx-int8
+    python scripts/test_embedding_parity.py torch-int8
+"""
+import os
+import sys
+import time
+import importlib.util
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+TOP_K = 5
+MIN_OVERLAP = 0.8  # Mean fraction of the fp32 top-k also returned by the candidate
+# Packages a candidate backend needs beyond the fp32 reference
+BACKEND_DEPENDENCIES = {
+    'onnx': ('onnxruntime', 'optimum'),
+    'onnx-int8': ('onnxruntime', 'optimum'),
+}
+
+CLAUSES = [
+    "A grace period of thirty days is provided for premium payment after the due date.",
+    "There is a waiting period of thirty-six months of continuous coverage for pre-existing diseases.",
+    "Maternity expenses are covered after the female insured has been continuously covered for 24 months.",
+    "The waiting period for cataract surgery is two years.",
+    "Medical expenses for an organ donor's hospitalization are covered when the organ is for an insured person.",
+    "A No Claim Discount of 5% on the base premium is offered on renewal for a one-year policy term.",
+    "Expenses for preventive health check-ups are reimbursed at the end of every block of two policy years.",
+    "A hospital is an institution with at least 10 inpatient beds in towns with a population below ten lakhs.",
+    "AYUSH treatments are covered up to the sum insured when taken as inpatient in an AYUSH hospital.",
+    "Room rent is capped at 1% of the sum insured per day and ICU charges at 2% of the sum insured per day.",
+    "Claims must be notified to the company within 24 hours of emergency hospitalization.",
+    "Pre-hospitalization medical expenses are covered for 30 days prior to admission.",
+    "Post-hospitalization medical expenses are covered for 60 days after discharge.",
+    "Day care procedures that require less than 24 hours of hospitalization are covered.",
+    "Cosmetic or plastic surgery is excluded unless required for reconstruction following an accident.",
+    "Expenses arising from war, invasion or nuclear weapons are permanently excluded.",
+    "The policy may be cancelled by the insured at any time with a refund of premium on a short-period scale.",
+    "Ambulance charges up to Rs. 2,000 per hospitalization are payable.",
+    "Domiciliary hospitalization is covered when the patient cannot be moved to a hospital.",
+    "Treatment for alcohol or drug abuse is not covered under this policy.",
+    "Portability allows the insured to transfer to another insurer with credit for waiting periods.",
+    "The free look period is fifteen days from the date of receipt of the policy document.",
+    "Any dispute regarding the claim amount shall be referred to arbitration.",
+    "Co-payment of 10% applies to every claim for insured persons above 60 years of age.",
+    "Modern treatments such as robotic surgery are covered up to 50% of the sum insured.",
+    "Hearing aids, spectacles and contact lenses are not covered.",
+    "Bariatric surgery is covered only when the body mass index is above 40.",
+    "Newborn babies are covered from day one up to the limit of the mother's sum insured.",
+    "The sum insured is restored once per policy year if it is exhausted by claims.",
+    "Cashless facility is available only at network hospitals.",
+    "Claims for reimbursement must be submitted within 30 days of discharge with original bills.",
+    "Experimental or unproven treatments are excluded.",
+    "The policy covers expenses for dental treatment only when it requires hospitalization due to an accident.",
+    "Psychiatric illness is covered as inpatient treatment up to Rs. 50,000.",
+    "Renewal will not be denied on the grounds that the insured made a claim in the previous year.",
+    "The deductible of Rs. 25,000 applies per policy year before benefits are payable.",
+    "Second medical opinion is available for critical illnesses through the company's network.",
+    "Vaccination expenses are covered only for post-bite treatment.",
+    "The company shall settle the claim within 30 days of receipt of the last necessary document.",
+    "Accidental death benefit equal to 100% of the sum insured is payable to the nominee.",
+]
+
+QUESTIONS = [
+    "What is the grace period for premium payment?",
+    "What is the waiting period for pre-existing diseases?",
+    "Does the policy cover maternity expenses?",
+    "What is the waiting period for cataract surgery?",
+    "Are organ donor expenses covered?",
+    "What is the No Claim Discount?",
+    "Is there a benefit for preventive health check-ups?",
+    "How does the policy define a hospital?",
+    "Are AYUSH treatments covered?",
+    "Are there sub-limits on room rent and ICU charges?",
+    "How long after discharge are expenses covered?",
+    "Is cosmetic surgery covered?",
+    "How soon must a claim be settled?",
+    "Are newborn babies covered?",
+]
+
+
+def top_k(clause_embeddings, question_embeddings, k=TOP_K):
+    """Indices of the k most similar clauses per question (cosine similarity)"""
+    clauses = clause_embeddings / np.linalg.norm(clause_embeddings, axis=1, keepdims=True)
+    questions = question_embeddings / np.linalg.norm(question_embeddings, axis=1, keepdims=True)
+    return np.argsort(-(questions @ clauses.T), axis=1)[:, :k]
+
+
+def encode_all(model):
+    from embedding import encode_texts
+    start = time.perf_counter()
+    clause_embeddings = encode_texts(model, CLAUSES)
+    question_embeddings = encode_texts(model, QUESTIONS)
+    return clause_embeddings, question_embeddings, time.perf_counter() - start
+
+
+def load_models(backend):
+    """fp32 reference model and the candidate backend (ImportError if its dependencies are missing)"""
+    # Checked before loading anything, so a skip does not pay for the fp32 model
+    missing = [name for name in BACKEND_DEPENDENCIES.get(backend, ()) if importlib.util.find_spec(name) is None]
+    if missing:
+        raise ImportError(f"{', '.join(missing)} not installed")
+    from embedding import load_embedding_model, EMBEDDING_MODEL_NAME
+    return load_embedding_model(EMBEDDING_MODEL_NAME, 'torch'), load_embedding_model(EMBEDDING_MODEL_NAME, backend)
+
+
+def test_embedding_parity(backend=None):
+    backend = backend or os.getenv('EMBEDDING_PARITY_BACKEND', 'onnx-int8')
+    try:
+        reference, candidate = load_models(backend)
+    except ImportError as e:
+        import pytest
+        pytest.skip(f"backend dependencies are missing: {e}")
+    check_parity(reference, candidate, backend)
+
+
+def check_parity(reference, candidate, backend):
+    ref_clauses, ref_questions, ref_time = encode_all(reference)
+    cand_clauses, cand_questions, cand_time = encode_all(candidate)
+
+    ref_top = top_k(ref_clauses, ref_questions)
+    cand_top = top_k(cand_clauses, cand_questions)
+    overlaps = [len(set(r) & set(c)) / TOP_K for r, c in zip(ref_top, cand_top)]
+    top1 = np.mean(ref_top[:, 0] == cand_top[:, 0])
+    cosine = np.mean(np.sum(ref_clauses * cand_clauses, axis=1) /
+                     (np.linalg.norm(ref_clauses, axis=1) * np.linalg.norm(cand_clauses, axis=1)))
+
+    print(f"📊 fp32 vs {backend}: top-{TOP_K} overlap {np.mean(overlaps):.3f} "
+          f"(min {np.min(overlaps):.2f}), top-1 agreement {top1:.3f}, mean cosine {cosine:.4f}")
+    print(f"⏱️ Encode time: fp32 {ref_time:.2f}s, {backend} {cand_time:.2f}s")
+
+    assert np.mean(overlaps) >= MIN_OVERLAP, f"top-{TOP_K} overlap {np.mean(overlaps):.3f} < {MIN_OVERLAP}"
+
+
+if __name__ == "__main__":
+    print("🚀 Testing embedding backend parity")
+    print("=" * 50)
+    backend = sys.argv[1] if len(sys.argv) > 1 else os.getenv('EMBEDDING_PARITY_BACKEND', 'onnx-int8')
+    try:
+        reference, candidate = load_models(backend)
+    except ImportError as e:
+        print(f"⚠️ Skipping parity test, backend dependencies are missing: {e}")
+        sys.exit(0)
+    try:
+        check_parity(reference, candidate, backend)
+        print("✅ Parity check passed")
+    except AssertionError as e:
+        print(f"❌ Parity check failed: {e}")
+        sys.exit(1)
+    print("=" * 50)
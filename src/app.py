@@ -2,6 +2,7 @@ import os
 import logging
 import gc
 import time
+import threading
 from dotenv import load_dotenv
 
 # Configure logging early
@@ -15,63 +16,137 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-import pdfplumber
-try:
-    import fitz  # PyMuPDF for fast PDF extraction
-    # Verify it's the correct PyMuPDF module
-    if not hasattr(fitz, 'open'):
-        raise ImportError("Wrong fitz module loaded")
-except (ImportError, AttributeError):
-    # Fallback: Try importing PyMuPDF directly
-    try:
-        import pymupdf as fitz
-    except ImportError:
-        # Final fallback: use pdfplumber only
-        fitz = None
-        logger.warning("PyMuPDF not available, will use pdfplumber only")
-
-import requests
-import tempfile
+# Load environment variables before the sibling modules read their settings
+load_dotenv()
+
+import io
+import asyncio
+import hashlib
 import mimetypes
+from collections import OrderedDict
+from urllib.parse import urlparse, urlsplit, urlunsplit, parse_qsl, urlencode
 from docx import Document
 import email
 import email.policy
-from sentence_transformers import SentenceTransformer
-import faiss
 import numpy as np
-from transformers import pipeline
 import json
-import openai
 
-# Load environment variables
-load_dotenv()
+try:
+    from .extraction import extract_pdf_pages, iter_pdf_page_batches, shutdown_extraction_pool
+    from .embedding import shutdown_encode_pool, load_embedding_model
+    from .pipeline import embed_page_stream, embed_chunks
+    from .vector_index import search, build_index
+    from .query_cache import encode_queries, query_cache_stats
+    from .query_parser import QUERY_PARSER_MODE, get_query_matcher
+    from .chunking import CHUNKER_SIGNATURE
+    from .dedup import ChunkDeduplicator
+    from . import extraction_cache
+    from . import index_store
+    from .corpus_index import get_corpus_index
+    from .llm_client import get_sync_client, get_async_client, warm_up as warm_up_llm_client, warm_up_async, aclose_clients
+    from .response_cache import get_response_cache, response_key, response_cache_stats, LLM_CACHE_BYPASS_HEADER
+    from .semantic_cache import get_semantic_cache, semantic_cache_stats
+    from .http_client import get_http_session, ValidatorStore, extract_validators, conditional_headers
+    from .model_artifacts import MODEL_ARTIFACT_DIR, enable_offline_mode, embedding_model_path, ner_model_path
+except ImportError:
+    from extraction import extract_pdf_pages, iter_pdf_page_batches, shutdown_extraction_pool
+    from embedding import shutdown_encode_pool, load_embedding_model
+    from pipeline import embed_page_stream, embed_chunks
+    from vector_index import search, build_index
+    from query_cache import encode_queries, query_cache_stats
+    from query_parser import QUERY_PARSER_MODE, get_query_matcher
+    from chunking import CHUNKER_SIGNATURE
+    from dedup import ChunkDeduplicator
+    import extraction_cache
+    import index_store
+    from corpus_index import get_corpus_index
+    from llm_client import get_sync_client, get_async_client, warm_up as warm_up_llm_client, warm_up_async, aclose_clients
+    from response_cache import get_response_cache, response_key, response_cache_stats, LLM_CACHE_BYPASS_HEADER
+    from semantic_cache import get_semantic_cache, semantic_cache_stats
+    from http_client import get_http_session, ValidatorStore, extract_validators, conditional_headers
+    from model_artifacts import MODEL_ARTIFACT_DIR, enable_offline_mode, embedding_model_path, ner_model_path
+
+# With baked-in model artifacts nothing may reach the Hugging Face hub at runtime
+if MODEL_ARTIFACT_DIR:
+    enable_offline_mode()
 
-# Global model cache to prevent reloading
+# Global model cache to prevent reloading. torch, transformers and faiss are only
+# imported when a model or index is first built, so importing this module is cheap
 _model_cache = {
     'sentence_transformer': None,
     'ner_pipeline': None
 }
+_model_lock = threading.Lock()
 
-# Document cache to avoid reprocessing same documents
+# Per-model readiness reported by /ready: disabled | pending | loading | ready | failed
+_model_status = {
+    'sentence_transformer': {'status': 'pending', 'error': None, 'load_seconds': None},
+    'query_rules': {'status': 'pending', 'error': None, 'load_seconds': None},
+    'ner_pipeline': {'status': 'pending' if QUERY_PARSER_MODE == 'ner' else 'disabled',
+                     'error': None, 'load_seconds': None}
+}
+
+# Document cache to avoid reprocessing same documents.
+# Two levels: canonical URL -> SHA-256 of the document bytes, and
+# content hash -> processed results, so identical documents behind
+# different (e.g. re-signed) URLs share one set of chunks and embeddings
 _document_cache = {}
+_url_content_map = OrderedDict()
 MAX_CACHE_SIZE = 5  # Keep last 5 documents cached
+MAX_URL_MAP_SIZE = 256
+
+# Query parameters dropped when canonicalizing document URLs, e.g.
+# "sv,st,se,sr,sp,sig" for Azure SAS links. Empty keeps the full URL.
+DOCUMENT_URL_STRIP_PARAMS = {
+    param.strip() for param in os.getenv('DOCUMENT_URL_STRIP_PARAMS', '').split(',') if param.strip()
+}
+
+# ETag / Last-Modified per URL, with the chunks built from that response,
+# so a 304 Not Modified can skip download and extraction after eviction
+_validator_store = ValidatorStore()
+
+# Download limits - bytes are enforced while streaming, pages once the PDF is opened
+MAX_DOCUMENT_BYTES = int(os.getenv('MAX_DOCUMENT_BYTES', 50 * 1024 * 1024))  # 50MB
+MAX_DOCUMENT_PAGES = int(os.getenv('MAX_DOCUMENT_PAGES', 2000))
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+DOWNLOAD_TIMEOUT = int(os.getenv('DOWNLOAD_TIMEOUT', 60))  # seconds
 
-def get_document_cache_key(url):
-    """Generate cache key for document URL"""
-    import hashlib
-    return hashlib.md5(url.encode()).hexdigest()
+def canonicalize_document_url(url):
+    """Drop the configured volatile query parameters (signatures, expiry) from a URL"""
+    if not DOCUMENT_URL_STRIP_PARAMS:
+        return url
+    parts = urlsplit(url)
+    query = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if k not in DOCUMENT_URL_STRIP_PARAMS]
+    return urlunsplit(parts._replace(query=urlencode(query)))
 
-def get_cached_document(url):
-    """Get document from cache if available"""
-    cache_key = get_document_cache_key(url)
+def get_document_cache_key(data):
+    """Generate cache key from the document bytes (content-addressed)"""
+    return hashlib.sha256(data).hexdigest()
+
+def remember_document_url(url, cache_key):
+    """Record which content a canonical URL resolved to"""
+    canonical = canonicalize_document_url(url)
+    _url_content_map[canonical] = cache_key
+    _url_content_map.move_to_end(canonical)
+    while len(_url_content_map) > MAX_URL_MAP_SIZE:
+        _url_content_map.popitem(last=False)
+
+def get_cached_document(url=None, cache_key=None):
+    """Get document from cache if available, by URL or by content hash"""
+    if cache_key is None:
+        cache_key = _url_content_map.get(canonicalize_document_url(url))
+    if cache_key is None:
+        return None
     return _document_cache.get(cache_key)
 
-def cache_document(url, chunks, embeddings, index, model):
-    """Cache document processing results"""
-    cache_key = get_document_cache_key(url)
-    
+def cache_document(cache_key, chunks, embeddings, index, model, chunk_refs=None):
+    """
+    Cache document processing results under the document's content hash.
+    chunk_refs maps every chunk position in the document to its deduplicated
+    representative in chunks.
+    """
     # Implement LRU-style cache by removing oldest if at capacity
-    if len(_document_cache) >= MAX_CACHE_SIZE:
+    if cache_key not in _document_cache and len(_document_cache) >= MAX_CACHE_SIZE:
         # Remove the first (oldest) entry
         oldest_key = next(iter(_document_cache))
         del _document_cache[oldest_key]
@@ -81,26 +156,70 @@ def cache_document(url, chunks, embeddings, index, model):
         'chunks': chunks,
         'embeddings': embeddings, 
         'index': index,
-        'model': model
+        'model': model,
+        'chunk_refs': chunk_refs
     }
-    logger.info(f"Cached document processing results for {url[:50]}...")
+    logger.info(f"Cached document processing results for content {cache_key[:12]}...")
+
+def drop_cached_document(cache_key):
+    """Release a document's per-document index once the corpus index holds its vectors"""
+    _document_cache.pop(cache_key, None)
 
 def get_sentence_transformer():
     """Get cached sentence transformer model"""
     if _model_cache['sentence_transformer'] is None:
-        logger.info("Loading SentenceTransformer model (first time only)...")
-        _model_cache['sentence_transformer'] = SentenceTransformer('BAAI/bge-large-en-v1.5')
-        logger.info("SentenceTransformer model loaded and cached")
+        with _model_lock:
+            if _model_cache['sentence_transformer'] is None:
+                logger.info("Loading SentenceTransformer model (first time only)...")
+                # Backend (torch / torch-int8 / onnx / onnx-int8) is chosen by EMBEDDING_BACKEND
+                _model_cache['sentence_transformer'] = load_embedding_model(local_path=embedding_model_path())
+                logger.info("SentenceTransformer model loaded and cached")
     return _model_cache['sentence_transformer']
 
 def get_ner_pipeline():
     """Get cached NER pipeline"""
     if _model_cache['ner_pipeline'] is None:
-        logger.info("Loading NER pipeline (first time only)...")
-        _model_cache['ner_pipeline'] = pipeline("ner", model="dslim/bert-base-NER")
-        logger.info("NER pipeline loaded and cached")
+        with _model_lock:
+            if _model_cache['ner_pipeline'] is None:
+                from transformers import pipeline
+                logger.info("Loading NER pipeline (first time only)...")
+                _model_cache['ner_pipeline'] = pipeline("ner", model=ner_model_path() or "dslim/bert-base-NER")
+                logger.info("NER pipeline loaded and cached")
     return _model_cache['ner_pipeline']
 
+def _warm_up(name, load):
+    status = _model_status[name]
+    status['status'] = 'loading'
+    start = time.time()
+    try:
+        load()
+        status['status'] = 'ready'
+        status['load_seconds'] = round(time.time() - start, 2)
+        logger.info(f"Warm-up of {name} finished in {status['load_seconds']}s")
+    except Exception as e:
+        status['status'] = 'failed'
+        status['error'] = str(e)
+        logger.error(f"Warm-up of {name} failed: {e}")
+
+def _warm_up_embeddings():
+    # A dummy encode initializes the tokenizer and inference kernels; indexing it imports FAISS
+    embeddings = np.asarray(get_sentence_transformer().encode(["warm-up query"]), dtype=np.float32)
+    build_index(embeddings, 'flat')
+
+def warm_up_models():
+    """Load every model and run a dummy inference so the first real request is not slow"""
+    _warm_up('sentence_transformer', _warm_up_embeddings)
+    _warm_up('query_rules', lambda: get_query_matcher().match("warm-up query"))
+    if QUERY_PARSER_MODE == 'ner':
+        _warm_up('ner_pipeline', lambda: get_ner_pipeline()("Warm-up query"))
+
+def models_ready():
+    return all(status['status'] in ('ready', 'disabled') for status in _model_status.values())
+
+def models_warming_up():
+    """True while the startup warm-up is still loading a model (a failed model is retried lazily instead)"""
+    return any(status['status'] in ('pending', 'loading') for status in _model_status.values())
+
 def get_api_key():
     """
     Get API key with fallback support for different naming conventions
@@ -121,106 +240,211 @@ def get_api_key():
     raise ValueError("❌ No API key found! Please set OPENROUTER_API_KEY in your .env file")
 
 # Step 1: Document Ingestion
-def extract_text_from_pdf(pdf_path):
-    if fitz is not None:
-        # Use PyMuPDF (faster)
-        doc = fitz.open(pdf_path)
-        text = ""
-        for page in doc:
-            text += page.get_text()
-        doc.close()
-        # Clean text (e.g., remove OCR errors)
-        text = text.replace("iviviv", "").replace("Air Ambulasce", "Air Ambulance")
-        return text
-    else:
-        # Fallback to pdfplumber
-        logger.info("Using pdfplumber for PDF extraction")
-        with pdfplumber.open(pdf_path) as pdf:
-            text = ""
-            for page in pdf.pages:
-                page_text = page.extract_text()
-                if page_text:
-                    text += page_text + "\n"
-        # Clean text (e.g., remove OCR errors)
-        text = text.replace("iviviv", "").replace("Air Ambulasce", "Air Ambulance")
-        return text
+def _is_buffer(source):
+    """True when an extractor was handed in-memory document bytes instead of a path"""
+    return isinstance(source, (bytes, bytearray, memoryview))
+
+# Version of extraction + text cleanup; bump to invalidate the on-disk extraction cache and index store
+EXTRACTOR_VERSION = 1
+
+def _clean_extracted_text(text):
+    # Clean text (e.g., remove OCR errors)
+    return text.replace("iviviv", "").replace("Air Ambulasce", "Air Ambulance")
+
+def extract_text_from_pdf(pdf_source):
+    """Extract text from a PDF given either a file path or the raw document bytes"""
+    # Large documents are split across the extraction process pool (see extraction.py)
+    pages = extract_pdf_pages(pdf_source, max_pages=MAX_DOCUMENT_PAGES)
+    return _clean_extracted_text("".join(pages))
 
 # DOCX extraction
-def extract_text_from_docx(docx_path):
-    doc = Document(docx_path)
+def extract_text_from_docx(docx_source):
+    if _is_buffer(docx_source):
+        docx_source = io.BytesIO(docx_source)
+    doc = Document(docx_source)
     text = "\n".join([para.text for para in doc.paragraphs])
     return text
 
 # Email extraction (.eml)
-def extract_text_from_email(email_path):
-    with open(email_path, 'rb') as f:
-        msg = email.message_from_binary_file(f, policy=email.policy.default)
+def extract_text_from_email(email_source):
+    if _is_buffer(email_source):
+        msg = email.message_from_bytes(bytes(email_source), policy=email.policy.default)
+    else:
+        with open(email_source, 'rb') as f:
+            msg = email.message_from_binary_file(f, policy=email.policy.default)
     text = msg.get_body(preferencelist=('plain')).get_content() if msg.get_body(preferencelist=('plain')) else ''
     return text
 
-# Download file from URL and auto-detect type
-def download_and_extract_text(url):
-    response = requests.get(url)
-    if response.status_code != 200:
-        raise Exception(f"Failed to download file: {url}")
-    # Guess file type from headers or URL
-    content_type = response.headers.get('content-type', '')
-    ext = mimetypes.guess_extension(content_type) or url.split('.')[-1].lower()
-    with tempfile.NamedTemporaryFile(delete=False, suffix=ext) as tmp:
-        tmp.write(response.content)
-        tmp_path = tmp.name
-    # Dispatch to correct extractor
+def detect_document_type(url, content_type=''):
+    """Guess the document extension from the response headers, falling back to the URL path"""
+    ext = mimetypes.guess_extension(content_type.split(';')[0].strip()) if content_type else None
+    if not ext or ext == '.bin':
+        # Ignore the query string (SAS tokens etc.) when looking at the URL
+        ext = urlparse(url).path.rsplit('.', 1)[-1].lower()
+    return ext
+
+def download_document(url, validators=None):
+    """
+    Stream a document into memory over the shared HTTP session, enforcing
+    MAX_DOCUMENT_BYTES as data arrives.
+    Returns (data, ext, validators). When stored validators are passed and the
+    server answers 304 Not Modified, data and ext are None.
+    """
+    session = get_http_session()
+    with session.get(url, stream=True, timeout=DOWNLOAD_TIMEOUT, headers=conditional_headers(validators)) as response:
+        if response.status_code == 304 and validators:
+            logger.info(f"Document not modified: {url[:50]}...")
+            return None, None, validators
+        if response.status_code != 200:
+            raise Exception(f"Failed to download file: {url}")
+
+        # Reject early when the server already tells us the body is too large
+        declared_size = response.headers.get('content-length')
+        if declared_size and declared_size.isdigit() and int(declared_size) > MAX_DOCUMENT_BYTES:
+            raise Exception(f"Document too large: {declared_size} bytes (limit {MAX_DOCUMENT_BYTES})")
+
+        ext = detect_document_type(url, response.headers.get('content-type', ''))
+
+        data = bytearray()
+        for block in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+            data.extend(block)
+            if len(data) > MAX_DOCUMENT_BYTES:
+                raise Exception(f"Document exceeds size limit of {MAX_DOCUMENT_BYTES} bytes")
+
+        response_validators = extract_validators(response.headers)
+
+    logger.info(f"Downloaded {len(data)} bytes ({ext}) from {url[:50]}...")
+    return data, ext, response_validators
+
+def extract_text_from_buffer(data, ext):
+    """Dispatch in-memory document bytes to the correct extractor"""
     if ext in ['.pdf', 'pdf']:
-        return extract_text_from_pdf(tmp_path)
+        return extract_text_from_pdf(data)
     elif ext in ['.docx', 'docx']:
-        return extract_text_from_docx(tmp_path)
-    elif ext in ['.eml', 'msg']:
-        return extract_text_from_email(tmp_path)
+        return extract_text_from_docx(data)
+    elif ext in ['.eml', 'eml', 'msg']:
+        return extract_text_from_email(data)
     else:
         raise Exception(f"Unsupported file type: {ext}")
 
+def iter_document_pages(data, ext):
+    """Yield cleaned page-text batches in document order (PDFs stream page ranges)"""
+    if ext in ['.pdf', 'pdf']:
+        for pages in iter_pdf_page_batches(data, max_pages=MAX_DOCUMENT_PAGES):
+            yield [_clean_extracted_text(page) for page in pages]
+    else:
+        yield [extract_text_from_buffer(data, ext)]
+
+# Download file from URL and auto-detect type
+def download_and_extract_text(url):
+    data, ext, _ = download_document(url)
+    return extract_text_from_buffer(data, ext)
+
+def _extraction_cache_writer(cache_key, record=None):
+    """Build the on_extracted callback that persists text and chunk offsets"""
+    def on_extracted(pages, spans):
+        target = record or extraction_cache.ExtractionRecord.from_pages(pages)
+        target.set_chunk_spans(CHUNKER_SIGNATURE, spans)
+        extraction_cache.save(cache_key, EXTRACTOR_VERSION, target)
+    return on_extracted
+
+def process_document_buffer(data, ext, cache_key=None, deduplicator=None):
+    """
+    Extract, chunk and embed a downloaded document with the phases overlapped:
+    page batches flow into the chunker and each full chunk batch is encoded
+    while later pages are still being extracted. With a cache_key the
+    extracted text and chunk offsets are written to the extraction cache.
+    """
+    model = get_sentence_transformer()
+    on_extracted = _extraction_cache_writer(cache_key) if cache_key else None
+    return embed_page_stream(iter_document_pages(data, ext), model, on_extracted=on_extracted,
+                             deduplicator=deduplicator)
+
+def process_cached_extraction(cache_key, deduplicator=None):
+    """
+    Embed a document from the on-disk extraction cache, skipping PDF parsing.
+    Reuses the stored chunk offsets when they match the current chunker,
+    otherwise re-chunks the stored text. Returns None on a cache miss.
+    """
+    record = extraction_cache.load(cache_key, EXTRACTOR_VERSION)
+    if record is None:
+        return None
+    model = get_sentence_transformer()
+    chunks = record.chunks(CHUNKER_SIGNATURE)
+    if chunks is not None:
+        logger.info(f"Extraction cache hit: reusing {len(chunks)} stored chunks")
+        return embed_chunks(chunks, model, deduplicator=deduplicator)
+    logger.info("Extraction cache hit: re-chunking stored text")
+    return embed_page_stream([list(record.pages())], model,
+                             on_extracted=_extraction_cache_writer(cache_key, record),
+                             deduplicator=deduplicator)
+
+def load_document(url):
+    """
+    Get (chunks, embeddings, index, model, cache_hit) for a document URL.
+    Uses the in-memory document cache first (by canonical URL, then by the
+    SHA-256 of the downloaded bytes), then a conditional re-fetch against
+    stored validators, then the on-disk index store, and only processes the
+    document from scratch when its content has not been seen before.
+    """
+    cached_doc = get_cached_document(url)
+    if cached_doc:
+        logger.info("Using cached document processing results")
+        return cached_doc['chunks'], cached_doc['embeddings'], cached_doc['index'], cached_doc['model'], True
+
+    canonical_url = canonicalize_document_url(url)
+    stored = _validator_store.get(canonical_url)
+    data, ext, validators = download_document(url, stored)
+    if data is None:
+        # 304 Not Modified - same content as the stored response
+        cache_key = stored['content_hash']
+    else:
+        cache_key = get_document_cache_key(data)
+    remember_document_url(url, cache_key)
+
+    cached_doc = get_cached_document(cache_key=cache_key)
+    if cached_doc:
+        logger.info("Document content already processed under another URL, reusing results")
+        if data is not None:
+            _validator_store.put(canonical_url, validators, chunks=cached_doc['chunks'], content_hash=cache_key)
+        return cached_doc['chunks'], cached_doc['embeddings'], cached_doc['index'], cached_doc['model'], True
+
+    # Indexes persisted by an earlier process (or another worker) are reopened memory-mapped
+    stored_index = index_store.load(cache_key, EXTRACTOR_VERSION, get_sentence_transformer())
+    if stored_index is not None:
+        chunks, embeddings, index, chunk_refs = stored_index
+        if data is not None:
+            _validator_store.put(canonical_url, validators, chunks=chunks, content_hash=cache_key)
+        cache_document(cache_key, chunks, embeddings, index, get_sentence_transformer(), chunk_refs=chunk_refs)
+        return chunks, embeddings, index, get_sentence_transformer(), True
+
+    # Repeated boilerplate chunks are embedded once; dedup.back_refs keeps the mapping
+    dedup = ChunkDeduplicator()
+    processed = process_cached_extraction(cache_key, dedup)
+    if processed is not None:
+        chunks, embeddings, index, model_st = processed
+    elif data is None:
+        # Evicted but unmodified - reuse the stored chunks, only re-embed
+        logger.info("Reusing stored chunks for unmodified document")
+        chunks, embeddings, index, model_st = embed_chunks(stored['chunks'], get_sentence_transformer(), deduplicator=dedup)
+    else:
+        # Extraction, chunking and embedding run as one overlapped pipeline
+        chunks, embeddings, index, model_st = process_document_buffer(data, ext, cache_key, dedup)
+    if data is not None:
+        _validator_store.put(canonical_url, validators, chunks=chunks, content_hash=cache_key)
+    del data
+
+    cache_document(cache_key, chunks, embeddings, index, model_st, chunk_refs=dedup.back_refs)
+    index_store.save(cache_key, EXTRACTOR_VERSION, model_st, chunks, embeddings, index, chunk_refs=dedup.back_refs)
+    return chunks, embeddings, index, model_st, False
+
 # Step 2: Text Chunking and Embedding
 def create_document_embeddings(text):
     # Use cached model instead of creating new one
     model = get_sentence_transformer()
-    
-    # Split into smaller chunks to manage token limits better
-    # First split by paragraphs, then further split if needed
-    paragraphs = text.split("\n\n")
-    chunks = []
-    
-    for paragraph in paragraphs:
-        # If paragraph is too long, split it into smaller chunks
-        if len(paragraph) > 800:
-            # Split long paragraphs into sentences and group them
-            sentences = paragraph.split(". ")
-            current_chunk = ""
-            
-            for sentence in sentences:
-                if len(current_chunk + sentence) < 800:
-                    current_chunk += sentence + ". "
-                else:
-                    if current_chunk.strip():
-                        chunks.append(current_chunk.strip())
-                    current_chunk = sentence + ". "
-            
-            if current_chunk.strip():
-                chunks.append(current_chunk.strip())
-        else:
-            if paragraph.strip():
-                chunks.append(paragraph.strip())
-    
-    # Filter out very short chunks
-    chunks = [chunk for chunk in chunks if len(chunk) > 50]
-    
-    logger.info(f"Encoding {len(chunks)} chunks with cached model...")
-    embeddings = model.encode(chunks)
-    
-    # Create FAISS index
-    dimension = embeddings.shape[1]
-    index = faiss.IndexFlatL2(dimension)
-    index.add(embeddings)
-    return chunks, embeddings, index, model
+
+    # Token-aware chunking with overlap (see chunking.Chunker), encoded in batches
+    return embed_page_stream([[text]], model)
 
 def estimate_tokens(text: str) -> int:
     """
@@ -253,72 +477,98 @@ def estimate_tokens(text: str) -> int:
 
 # Step 3: Query Parsing
 def parse_query(query):
-    # Use cached NER pipeline instead of creating new one
-    nlp = get_ner_pipeline()
-    entities = nlp(query)
-    parsed = {"care_type": None, "beneficiary": None, "period": None}
-    for entity in entities:
-        if "mother" in query.lower():
-            parsed["beneficiary"] = "mother"
-        if "preventive care" in query.lower():
-            parsed["care_type"] = "routine preventive care"
-        if "just delivered" in query.lower():
-            parsed["period"] = "postpartum"
+    # Fields come from the compiled rules in query_rules.json; NER only runs when opted in
+    parsed = get_query_matcher().match(query)
+    if QUERY_PARSER_MODE == 'ner':
+        parsed["entities"] = [entity["word"] for entity in get_ner_pipeline()(query)]
     return parsed
 
 # Step 4: Semantic Retrieval
+def retrieve_relevant_chunks_batch(queries, chunks, embeddings, index, model, k=2, return_embeddings=False):
+    """
+    Excerpts for every question, from one encoder pass and one multi-query
+    index search (with the query embeddings when return_embeddings is set)
+    """
+    query_embeddings = encode_queries(model, queries)
+    distances, indices = search(index, query_embeddings, k)
+    results = []
+    for row in indices:
+        # Limit chunk size to prevent token overflow
+        relevant_chunks = []
+        for i in row:
+            if i < 0:
+                continue  # Approximate indexes pad with -1 when they find fewer than k results
+            chunk = chunks[i]
+            # Limit each chunk to 500 characters to stay within token limits
+            if len(chunk) > 500:
+                chunk = chunk[:500] + "..."
+            relevant_chunks.append(chunk)
+        results.append(relevant_chunks)
+    return (results, query_embeddings) if return_embeddings else results
+
 def retrieve_relevant_chunks(query, chunks, embeddings, index, model, k=2):
-    query_embedding = model.encode([query])[0]
-    distances, indices = index.search(np.array([query_embedding]), k)
-    # Limit chunk size to prevent token overflow
-    relevant_chunks = []
-    for i in indices[0]:
-        chunk = chunks[i]
-        # Limit each chunk to 500 characters to stay within token limits
-        if len(chunk) > 500:
-            chunk = chunk[:500] + "..."
-        relevant_chunks.append(chunk)
-    return relevant_chunks
+    return retrieve_relevant_chunks_batch([query], chunks, embeddings, index, model, k)[0]
+
+def retrieve_corpus_chunks_batch(queries, doc_ids, model, k_per_document=2, max_k=6, return_embeddings=False):
+    """Excerpts for every question across several documents: one encode, one filtered corpus search"""
+    query_embeddings = encode_queries(model, queries)
+    k = min(k_per_document * len(doc_ids), max_k)
+    labels = {doc_id: i + 1 for i, doc_id in enumerate(doc_ids)}
+    results = []
+    for row in get_corpus_index().search(query_embeddings, k, doc_ids=doc_ids):
+        relevant_chunks = []
+        for doc_id, chunk, score in row:
+            if len(chunk) > 500:
+                chunk = chunk[:500] + "..."
+            # Excerpts only need a source label when several documents are searched
+            relevant_chunks.append(f"[Document {labels[doc_id]}] {chunk}" if len(doc_ids) > 1 else chunk)
+        results.append(relevant_chunks)
+    return (results, query_embeddings) if return_embeddings else results
 
 # Step 5: Decision and Output Generation
-def generate_response(query, chunks, embeddings=None, index=None, model_st=None, llm_model="anthropic/claude-3-haiku"):
-    # Configure OpenRouter API using new OpenAI client
-    from openai import OpenAI
-    
-    try:
-        api_key = get_api_key()
-        if not api_key:
-            raise ValueError("No API key found")
-            
-        # Set the API key in environment for OpenAI client
-        os.environ['OPENAI_API_KEY'] = api_key
-        
-        client = OpenAI(
-            api_key=api_key,
-            base_url="https://openrouter.ai/api/v1"
-        )
-        
-        logger.info(f"OpenAI client initialized with API key: {api_key[:20]}...")
-        
-    except ValueError as e:
-        logger.error(f"API Key Error: {e}")
-        return json.dumps({
-            "answer": "❌ API key not configured. Please set OPENROUTER_API_KEY in your .env file.",
-            "justification": "Cannot process query without API key.",
-            "confidence": 0.0
-        })
-    except Exception as e:
-        logger.error(f"Client initialization error: {e}")
-        return json.dumps({
-            "answer": "❌ Failed to initialize AI client.",
-            "justification": f"Error: {str(e)}",
-            "confidence": 0.0
-        })
-    
-    parsed_query = parse_query(query)
-    relevant_chunks = retrieve_relevant_chunks(query, chunks, embeddings, index, model_st)
-    
-    # Construct prompt for LLM
+LLM_MODEL = "anthropic/claude-3-haiku"
+# Questions of one request sent to the LLM at the same time
+LLM_CONCURRENCY = int(os.getenv('LLM_CONCURRENCY', 8))
+# Questions answered together in one LLM call over their shared excerpts (1 disables batching)
+LLM_BATCH_SIZE = int(os.getenv('LLM_BATCH_SIZE', 6))
+# Prompt token budget of one batch (excerpts + questions)
+LLM_BATCH_PROMPT_TOKENS = int(os.getenv('LLM_BATCH_PROMPT_TOKENS', 6000))
+LLM_EXTRA_HEADERS = {
+    "HTTP-Referer": "http://localhost:5000",
+    "X-Title": "PDF Q&A System"
+}
+SYSTEM_PROMPT = (
+    "You are an expert insurance analyst AI. "
+    "Always answer strictly based on the provided document excerpts. "
+    "If the answer is not present, reply 'Unable to determine'. "
+    "Return your answer in the specified JSON format. "
+    "Do not hallucinate or make assumptions."
+)
+
+def _api_key_missing_response():
+    return json.dumps({
+        "answer": "❌ API key not configured. Please set OPENROUTER_API_KEY in your .env file.",
+        "justification": "Cannot process query without API key.",
+        "confidence": 0.0
+    })
+
+def _client_error_response(e):
+    return json.dumps({
+        "answer": "❌ Failed to initialize AI client.",
+        "justification": f"Error: {str(e)}",
+        "confidence": 0.0
+    })
+
+def _generation_error_response(e):
+    # Fallback response in case of API errors
+    return json.dumps({
+        "decision": "Error",
+        "amount": None,
+        "justification": f"Error generating response: {str(e)}"
+    }, indent=2)
+
+def build_answer_prompt(query, relevant_chunks):
+    """User prompt for one question, shortened to a single excerpt if it would be too long"""
     prompt = f"""Based on these document excerpts, answer the query in JSON format.
 
 Query: {query}
@@ -351,62 +601,300 @@ Query: {query}
 Excerpt: {relevant_chunks[0][:300]}...
 
 Format: {{"decision": "...", "amount": "...", "justification": "..."}}"""
+    return prompt
+
+def build_answer_messages(query, relevant_chunks):
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": build_answer_prompt(query, relevant_chunks)}
+    ]
+
+def _strip_markdown_fence(response_text):
+    """Extract JSON from response if it's wrapped in markdown"""
+    if "```json" in response_text:
+        json_start = response_text.find("```json") + 7
+        json_end = response_text.find("```", json_start)
+        response_text = response_text[json_start:json_end].strip()
+    elif "```" in response_text:
+        json_start = response_text.find("```") + 3
+        json_end = response_text.find("```", json_start)
+        response_text = response_text[json_start:json_end].strip()
+    return response_text
 
+def parse_llm_response(response_text):
+    """Normalize the model's reply to a JSON string"""
+    # Try to parse as JSON, if it fails, format it properly
     try:
-        # Generate response using OpenRouter with new API
-        system_prompt = (
-            "You are an expert insurance analyst AI. "
-            "Always answer strictly based on the provided document excerpts. "
-            "If the answer is not present, reply 'Unable to determine'. "
-            "Return your answer in the specified JSON format. "
-            "Do not hallucinate or make assumptions."
-        )
-        response = client.chat.completions.create(
-            model=llm_model,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=256,  # Lower this value
-            extra_headers={
-                "HTTP-Referer": "http://localhost:5000",
-                "X-Title": "PDF Q&A System"
-            }
-        )
-        
-        response_text = response.choices[0].message.content
+        response_text = _strip_markdown_fence(response_text)
         
-        # Try to parse as JSON, if it fails, format it properly
-        try:
-            # Extract JSON from response if it's wrapped in markdown
-            if "```json" in response_text:
-                json_start = response_text.find("```json") + 7
-                json_end = response_text.find("```", json_start)
-                response_text = response_text[json_start:json_end].strip()
-            elif "```" in response_text:
-                json_start = response_text.find("```") + 3
-                json_end = response_text.find("```", json_start)
-                response_text = response_text[json_start:json_end].strip()
-            
-            # Validate JSON format
-            parsed_response = json.loads(response_text)
-            return json.dumps(parsed_response, indent=2)
-        except json.JSONDecodeError:
-            # If JSON parsing fails, create a structured response
-            return json.dumps({
-                "decision": "Unable to determine",
-                "amount": None,
-                "justification": f"AI Response: {response_text}"
-            }, indent=2)
-            
-    except Exception as e:
-        # Fallback response in case of API errors
+        # Validate JSON format
+        parsed_response = json.loads(response_text)
+        return json.dumps(parsed_response, indent=2)
+    except json.JSONDecodeError:
+        # If JSON parsing fails, create a structured response
         return json.dumps({
-            "decision": "Error",
+            "decision": "Unable to determine",
             "amount": None,
-            "justification": f"Error generating response: {str(e)}"
+            "justification": f"AI Response: {response_text}"
         }, indent=2)
 
+def is_valid_answer_reply(response_text):
+    """True when a single-question reply holds a JSON object (not a truncated or free-text reply)"""
+    try:
+        return isinstance(json.loads(_strip_markdown_fence(response_text)), dict)
+    except json.JSONDecodeError:
+        return False
+
+def group_questions(questions, excerpts, max_questions=LLM_BATCH_SIZE, max_tokens=LLM_BATCH_PROMPT_TOKENS):
+    """
+    Split questions (in order) into batches of at most max_questions whose
+    questions plus the union of their excerpts fit in max_tokens.
+    Returns (question indices, deduplicated excerpts) per batch.
+    """
+    groups = []
+    indices, group_excerpts, tokens = [], [], 0
+    for i, question in enumerate(questions):
+        new_excerpts = [chunk for chunk in dict.fromkeys(excerpts[i]) if chunk not in group_excerpts]
+        added = estimate_tokens(question) + sum(estimate_tokens(chunk) for chunk in new_excerpts)
+        if indices and (len(indices) >= max_questions or tokens + added > max_tokens):
+            groups.append((indices, group_excerpts))
+            indices, group_excerpts, tokens = [], [], 0
+            new_excerpts = list(dict.fromkeys(excerpts[i]))
+            added = estimate_tokens(question) + sum(estimate_tokens(chunk) for chunk in new_excerpts)
+        indices.append(i)
+        group_excerpts.extend(new_excerpts)
+        tokens += added
+    if indices:
+        groups.append((indices, group_excerpts))
+    return groups
+
+def build_batch_messages(questions, relevant_chunks):
+    """Prompt answering several questions over one shared set of excerpts"""
+    prompt = f"""Based on these document excerpts, answer each question in JSON format.
+
+Document excerpts:
+{chr(10).join([f"{i+1}. {chunk}" for i, chunk in enumerate(relevant_chunks)])}
+
+Questions:
+{chr(10).join([f"{i+1}. {question}" for i, question in enumerate(questions)])}
+
+Response format: a JSON array with exactly one object per question, in question order:
+[
+    {{
+        "question": 1,
+        "decision": "Covered/Not Covered/Partially Covered/Unable to determine",
+        "amount": "coverage amount or null",
+        "justification": "brief explanation based on excerpts"
+    }}
+]
+
+Base answers only on provided excerpts."""
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": prompt}
+    ]
+
+def parse_batch_response(response_text, count):
+    """
+    Map the model's JSON array back to questions. Returns one JSON string per
+    question, or None where the entry is missing or malformed.
+    """
+    answers = [None] * count
+    start, end = response_text.find('['), response_text.rfind(']')
+    if start < 0 or end < start:
+        return answers
+    try:
+        items = json.loads(response_text[start:end + 1])
+    except json.JSONDecodeError:
+        return answers
+    if not isinstance(items, list):
+        return answers
+    for position, item in enumerate(items):
+        if not isinstance(item, dict) or 'justification' not in item:
+            continue
+        number = item.pop('question', position + 1)
+        if isinstance(number, str) and number.strip().isdigit():
+            number = int(number)
+        if isinstance(number, int) and 1 <= number <= count and answers[number - 1] is None:
+            answers[number - 1] = json.dumps(item, indent=2)
+    return answers
+
+def _cache_lookup(llm_model, messages, relevant_chunks, max_tokens, use_cache):
+    """(cache, key, cached reply or None) for one completion request"""
+    cache = get_response_cache()
+    if cache is None:
+        return None, None, None
+    try:
+        key = response_key(llm_model, messages, relevant_chunks, max_tokens)
+        return cache, key, cache.get(key) if use_cache else None
+    except Exception as e:
+        logger.warning(f"LLM response cache lookup failed: {e}")
+        return None, None, None
+
+def _cache_store(cache, key, reply, validate):
+    # Truncated or malformed replies are not cached, so a repeat gets a fresh attempt
+    if cache is None or not isinstance(reply, str) or not validate(reply):
+        return
+    try:
+        cache.put(key, reply)
+    except Exception as e:
+        logger.warning(f"Could not write LLM response to the cache: {e}")
+
+def complete(client, llm_model, messages, relevant_chunks, max_tokens, use_cache=True,
+             validate=is_valid_answer_reply):
+    """
+    Chat completion text, served from the LLM response cache when the same
+    request was answered before. Only replies passing validate are cached.
+    """
+    cache, key, reply = _cache_lookup(llm_model, messages, relevant_chunks, max_tokens, use_cache)
+    if reply is not None:
+        return reply
+    response = client.chat.completions.create(
+        model=llm_model,
+        messages=messages,
+        max_tokens=max_tokens,
+        extra_headers=LLM_EXTRA_HEADERS
+    )
+    reply = response.choices[0].message.content
+    _cache_store(cache, key, reply, validate)
+    return reply
+
+async def complete_async(client, llm_model, messages, relevant_chunks, max_tokens, use_cache=True,
+                         validate=is_valid_answer_reply):
+    # The cache is SQLite (reads update the LRU timestamp), so it is used from a worker thread
+    cache, key, reply = await asyncio.to_thread(_cache_lookup, llm_model, messages, relevant_chunks,
+                                                max_tokens, use_cache)
+    if reply is not None:
+        return reply
+    response = await client.chat.completions.create(
+        model=llm_model,
+        messages=messages,
+        max_tokens=max_tokens,
+        extra_headers=LLM_EXTRA_HEADERS
+    )
+    reply = response.choices[0].message.content
+    await asyncio.to_thread(_cache_store, cache, key, reply, validate)
+    return reply
+
+def generate_response(query, chunks, embeddings=None, index=None, model_st=None, llm_model=LLM_MODEL,
+                      relevant_chunks=None, use_cache=True):
+    try:
+        # Process-wide client: connections to the LLM API are pooled and kept alive across calls
+        client = get_sync_client(get_api_key())
+    except ValueError as e:
+        logger.error(f"API Key Error: {e}")
+        return _api_key_missing_response()
+    except Exception as e:
+        logger.error(f"Client initialization error: {e}")
+        return _client_error_response(e)
+    
+    # Callers answering many questions pass excerpts from one batched retrieval
+    if relevant_chunks is None:
+        relevant_chunks = retrieve_relevant_chunks(query, chunks, embeddings, index, model_st)
+
+    try:
+        # Generate response using OpenRouter with new API
+        reply = complete(client, llm_model, build_answer_messages(query, relevant_chunks), relevant_chunks,
+                         max_tokens=256, use_cache=use_cache)
+        return parse_llm_response(reply)
+    except Exception as e:
+        return _generation_error_response(e)
+
+async def generate_response_async(client, query, relevant_chunks, llm_model=LLM_MODEL, use_cache=True):
+    """
+    Answer one question with already-retrieved excerpts through an async
+    client. Returns (answer, valid): valid is False when the reply was not a
+    JSON answer (parse fallback) or the call failed.
+    """
+    try:
+        reply = await complete_async(client, llm_model, build_answer_messages(query, relevant_chunks),
+                                     relevant_chunks, max_tokens=256, use_cache=use_cache)
+        return parse_llm_response(reply), is_valid_answer_reply(reply)
+    except Exception as e:
+        return _generation_error_response(e), False
+
+async def generate_batch_response_async(client, questions, relevant_chunks, llm_model=LLM_MODEL, use_cache=True):
+    """Answer several questions in one call; entries the model got wrong come back as None"""
+    try:
+        reply = await complete_async(client, llm_model, build_batch_messages(questions, relevant_chunks),
+                                     relevant_chunks, max_tokens=256 * len(questions), use_cache=use_cache,
+                                     validate=lambda reply: None not in parse_batch_response(reply, len(questions)))
+        return parse_batch_response(reply, len(questions))
+    except Exception as e:
+        logger.warning(f"Batch answer for {len(questions)} questions failed: {e}")
+        return [None] * len(questions)
+
+async def generate_responses(questions, excerpts, llm_model=LLM_MODEL, concurrency=LLM_CONCURRENCY,
+                             batch_size=LLM_BATCH_SIZE, use_cache=True):
+    """
+    Answer all questions, at most `concurrency` LLM calls in flight,
+    returning the answers in question order.
+
+    Questions are grouped under a token budget and each group is answered
+    in one call that sends the union of its excerpts once; questions the
+    batch answer is missing are retried with their own call. use_cache=False
+    skips LLM response cache lookups.
+
+    Returns (answers, valid), valid[i] being False for error responses and
+    replies that were not a JSON answer.
+    """
+    try:
+        client = get_async_client(get_api_key())
+    except ValueError as e:
+        logger.error(f"API Key Error: {e}")
+        return [_api_key_missing_response()] * len(questions), [False] * len(questions)
+    except Exception as e:
+        logger.error(f"Client initialization error: {e}")
+        return [_client_error_response(e)] * len(questions), [False] * len(questions)
+
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    answers = [None] * len(questions)
+    # Batch entries are only kept when they parse, so every batch answer is valid
+    valid = [True] * len(questions)
+
+    async def answer(i):
+        async with semaphore:
+            logger.info(f"Processing question {i+1}/{len(questions)}: {questions[i][:50]}...")
+            answers[i], valid[i] = await generate_response_async(
+                client, questions[i], excerpts[i], llm_model, use_cache)
+
+    async def answer_group(indices, group_excerpts):
+        if len(indices) > 1:
+            async with semaphore:
+                logger.info(f"Processing questions {[i + 1 for i in indices]} of {len(questions)} in one batch")
+                batch = await generate_batch_response_async(
+                    client, [questions[i] for i in indices], group_excerpts, llm_model, use_cache)
+            for i, response in zip(indices, batch):
+                answers[i] = response
+        missing = [i for i in indices if answers[i] is None]
+        if len(indices) > 1 and missing:
+            logger.warning(f"Batch answer missing questions {[i + 1 for i in missing]}, asking them one by one")
+        await asyncio.gather(*(answer(i) for i in missing))
+
+    groups = group_questions(questions, excerpts, max_questions=max(1, batch_size))
+    await asyncio.gather(*(answer_group(indices, group_excerpts) for indices, group_excerpts in groups))
+    return answers, valid
+
+async def answer_questions(document_key, questions, excerpts, query_embeddings, use_cache=True):
+    """
+    Answers in question order, reusing cached answers to paraphrases of
+    earlier questions on the same document and asking the LLM for the rest.
+    """
+    semantic_cache = get_semantic_cache()
+    answers = semantic_cache.lookup(document_key, query_embeddings, excerpts) if use_cache else [None] * len(questions)
+    missing = [i for i, answer in enumerate(answers) if answer is None]
+    if len(missing) < len(questions):
+        logger.info(f"Semantic answer cache served {len(questions) - len(missing)} of {len(questions)} questions")
+    if missing:
+        responses, valid = await generate_responses([questions[i] for i in missing], [excerpts[i] for i in missing],
+                                                    use_cache=use_cache)
+        for i, response in zip(missing, responses):
+            answers[i] = response
+        # Errors and free-text replies (the parse fallback) are not remembered
+        semantic_cache.store(document_key, query_embeddings[missing], [excerpts[i] for i in missing],
+                             [response if ok else None for response, ok in zip(responses, valid)])
+    return answers
+
 # Interactive Question-Answer Function
 def interactive_qa_session(chunks, embeddings, index, model_st):
     logger.info("Starting interactive Q&A session")
@@ -461,7 +949,7 @@ def interactive_qa_session(chunks, embeddings, index, model_st):
 from fastapi import FastAPI, UploadFile, File, Form, Request, Header, Body, HTTPException
 from fastapi.responses import JSONResponse
 import uvicorn
-from typing import List, Optional
+from typing import List, Optional, Union
 import time
 from collections import defaultdict
 
@@ -489,15 +977,69 @@ app = FastAPI()
 # Preload models at startup to avoid delays on first request
 @app.on_event("startup")
 async def startup_event():
-    logger.info("Preloading ML models at startup...")
+    # Load models in the background so the server binds immediately; /ready reports progress.
+    # /hackrx/run answers 503 until the warm-up is done
+    logger.info("Warming up ML models in the background...")
+    threading.Thread(target=warm_up_models, name="model-warm-up", daemon=True).start()
+    # Open the LLM API connection now instead of on the first question
     try:
-        # Preload sentence transformer
-        get_sentence_transformer()
-        # Preload NER pipeline  
-        get_ner_pipeline()
-        logger.info("All models preloaded successfully!")
-    except Exception as e:
-        logger.error(f"Error preloading models: {e}")
+        asyncio.create_task(warm_up_async(get_api_key()))
+    except ValueError as e:
+        logger.warning(f"Skipping LLM client warm-up: {e}")
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    # Stop the extraction and embedding worker pools so no child processes outlive the server
+    shutdown_extraction_pool()
+    shutdown_encode_pool()
+    await aclose_clients()
+
+# Document loading and index state is shared; one request prepares its documents at a time
+_document_lock = threading.Lock()
+
+def prepare_excerpts(corpus, unique_urls, questions):
+    """
+    Load the request's documents and retrieve the excerpts for every question.
+    Blocking (download, extraction, embedding, model loading), so the endpoint
+    runs it in a worker thread. Returns (doc_ids, chunks, excerpts,
+    query_embeddings, model, cache_hit).
+    """
+    with _document_lock:
+        # Documents already in the corpus index are pinned there for this request;
+        # the rest are loaded and, for multi-document requests, moved into it
+        pinned = corpus.acquire([_url_content_map.get(canonicalize_document_url(url)) for url in unique_urls])
+        try:
+            if len(unique_urls) == 1 and not pinned:
+                chunks, embeddings, index, model_st, cache_hit = load_document(unique_urls[0])
+                logger.info(f"Using {len(chunks)} chunks for processing")
+
+                # Retrieve excerpts for all questions at once: one encode, one index search
+                excerpts, query_embeddings = retrieve_relevant_chunks_batch(
+                    questions, chunks, embeddings, index, model_st, return_embeddings=True)
+                doc_ids = [_url_content_map[canonicalize_document_url(unique_urls[0])]]
+            else:
+                # The documents share the corpus index and are searched together, restricted
+                # to this request's documents; their per-document indexes are released
+                model_st = get_sentence_transformer()
+                doc_ids, chunks, cache_hit = [], [], True
+                for url in unique_urls:
+                    doc_id = _url_content_map.get(canonicalize_document_url(url))
+                    if doc_id not in pinned:
+                        doc_chunks, embeddings, index, model_st, doc_cache_hit = load_document(url)
+                        doc_id = _url_content_map[canonicalize_document_url(url)]
+                        corpus.add_document_index(doc_id, doc_chunks, embeddings, index, pin=True)
+                        pinned.append(doc_id)
+                        drop_cached_document(doc_id)
+                        cache_hit = cache_hit and doc_cache_hit
+                    if doc_id not in doc_ids:
+                        doc_ids.append(doc_id)
+                        chunks.extend(corpus.chunks(doc_id))
+                logger.info(f"Using {len(chunks)} chunks from {len(doc_ids)} documents for processing")
+                excerpts, query_embeddings = retrieve_corpus_chunks_batch(
+                    questions, doc_ids, model_st, return_embeddings=True)
+        finally:
+            corpus.release(pinned)
+    return doc_ids, chunks, excerpts, query_embeddings, model_st, cache_hit
 
 def verify_bearer_token(authorization: str):
     """
@@ -518,9 +1060,18 @@ def verify_bearer_token(authorization: str):
 
 # HackRx 6.0 compliant endpoint
 
+@app.get("/ready")
+async def readiness_check():
+    """Readiness probe: 200 once every enabled model is loaded and warmed up, 503 before"""
+    ready = models_ready()
+    return JSONResponse({
+        "status": "ready" if ready else "not_ready",
+        "models": _model_status
+    }, status_code=200 if ready else 503)
+
 @app.get("/health")
 async def health_check():
-    """Health check endpoint for monitoring and Docker health checks"""
+    """Liveness check for monitoring and Docker health checks; never waits on model loading"""
     try:
         api_key = get_api_key()
         if not api_key:
@@ -533,7 +1084,10 @@ async def health_check():
             "status": "healthy",
             "service": "Intelligent Query PDF Q&A System",
             "version": "1.0.0",
-            "api_configured": True
+            "api_configured": True,
+            "query_embedding_cache": query_cache_stats(),
+            "llm_response_cache": response_cache_stats(),
+            "semantic_answer_cache": semantic_cache_stats()
         })
     except Exception as e:
         return JSONResponse({
@@ -545,7 +1099,7 @@ async def health_check():
 async def hackrx_run(
     request: Request,
     authorization: str = Header(None),
-    documents: Optional[str] = Body(None),
+    documents: Optional[Union[str, List[str]]] = Body(None),
     questions: Optional[List[str]] = Body(None)
 ):
     # Rate limiting check
@@ -560,6 +1114,14 @@ async def hackrx_run(
         logger.warning(f"Bearer token verification failed: {err}")
         return JSONResponse({"success": False, "error": err}, status_code=401)
 
+    # Model loading holds a lock the request would otherwise block the event loop on
+    if models_warming_up():
+        logger.warning("Request received while models are still warming up")
+        return JSONResponse({
+            "success": False,
+            "error": "Models are still loading. Please retry shortly."
+        }, status_code=503, headers={"Retry-After": "5"})
+
     # Validate input parameters
     if not documents:
         logger.warning("Request missing documents parameter")
@@ -582,52 +1144,50 @@ async def hackrx_run(
             "error": "Questions must be a non-empty list."
         }, status_code=400)
     
-    # Validate URL format
-    if not documents.startswith(('http://', 'https://')):
-        logger.warning(f"Invalid document URL format: {documents}")
+    # Validate URL format (a single URL or a list of URLs)
+    document_urls = documents if isinstance(documents, list) else [documents]
+    for url in document_urls:
+        if not isinstance(url, str) or not url.startswith(('http://', 'https://')):
+            logger.warning(f"Invalid document URL format: {url}")
+            return JSONResponse({
+                "success": False, 
+                "error": "Documents parameter must be a valid URL or a list of URLs."
+            }, status_code=400)
+
+    # Every document of a request must fit in the corpus index at once
+    corpus = get_corpus_index()
+    # First occurrence of each document, in the order the client listed them ([Document N] labels follow it)
+    unique_urls = {}
+    for url in document_urls:
+        unique_urls.setdefault(canonicalize_document_url(url), url)
+    unique_urls = list(unique_urls.values())
+    if len(unique_urls) > corpus.max_documents:
+        logger.warning(f"Request with {len(unique_urls)} documents exceeds CORPUS_MAX_DOCUMENTS")
         return JSONResponse({
-            "success": False, 
-            "error": "Documents parameter must be a valid URL."
+            "success": False,
+            "error": f"At most {corpus.max_documents} documents can be queried in one request."
         }, status_code=400)
 
     try:
-        # Download and extract text from the document URL
-        logger.info(f"Processing document URL: {documents}")
-        
-        # Check cache first
-        cached_doc = get_cached_document(documents)
-        if cached_doc:
-            logger.info("Using cached document processing results")
-            chunks = cached_doc['chunks']
-            embeddings = cached_doc['embeddings']
-            index = cached_doc['index']
-            model_st = cached_doc['model']
-        else:
-            # Process document if not cached
-            text = download_and_extract_text(documents)
-            logger.info(f"Extracted {len(text)} characters from document")
-            
-            chunks, embeddings, index, model_st = create_document_embeddings(text)
-            logger.info(f"Created {len(chunks)} chunks for processing")
-            
-            # Cache the results
-            cache_document(documents, chunks, embeddings, index, model_st)
+        # Download and extract text from the document URL(s)
+        logger.info(f"Processing document URL(s): {documents}")
 
-        # Generate answers for each question
+        # Off the event loop, so /health, /ready and other requests stay responsive
+        doc_ids, chunks, excerpts, query_embeddings, model_st, cache_hit = await asyncio.to_thread(
+            prepare_excerpts, corpus, unique_urls, questions)
+
+        # Generate answers in batches, concurrently (bounded by LLM_CONCURRENCY), in question order
         answers = []
-        for i, q in enumerate(questions):
-            logger.info(f"Processing question {i+1}/{len(questions)}: {q[:50]}...")
-            response = generate_response(q, chunks, embeddings, index, model_st)
+        use_cache = request.headers.get(LLM_CACHE_BYPASS_HEADER, '').lower() != 'bypass'
+        # Cached answers are per document set, LLM and embedding model (query vectors of different models don't compare)
+        document_key = (tuple(sorted(doc_ids)), LLM_MODEL, getattr(model_st, 'embedding_key', None) or id(model_st))
+        for response in await answer_questions(document_key, questions, excerpts, query_embeddings, use_cache):
             try:
                 result = json.loads(response)
                 answer = result.get('justification') or str(result)
             except Exception:
                 answer = response
             answers.append(answer)
-            
-            # Force garbage collection after each question to manage memory
-            if i % 3 == 0:  # Every 3 questions
-                gc.collect()
 
         # Add processing_info for leaderboard compliance
         processing_info = {
@@ -635,14 +1195,14 @@ async def hackrx_run(
             "token_usage": None,    # Set if available from LLM response
             "chunks_processed": len(chunks),
             "questions_answered": len(questions),
-            "cache_hit": cached_doc is not None
+            "documents_processed": len(doc_ids),
+            "cache_hit": cache_hit
         }
         
         logger.info(f"Successfully processed {len(questions)} questions")
         
-        # Final cleanup (but don't delete cached items)
-        if not cached_doc:  # Only cleanup if we didn't use cache
-            del chunks, embeddings, index, model_st
+        # Final cleanup (cached items stay referenced by the document cache)
+        del chunks, model_st
         gc.collect()
         
         return JSONResponse({
@@ -661,10 +1221,6 @@ if __name__ == "__main__":
     # Load environment variables
     load_dotenv()
     
-    # Get API key and set it for OpenAI client
-    api_key = get_api_key()
-    openai.api_key = api_key
-    
     # Get port from environment or use default
     port = int(os.getenv('PORT', 3000))
     
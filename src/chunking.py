@@ -0,0 +1,219 @@
+# Linear-time, token-aware text chunking
+import os
+import re
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Chunk sizes are in approximate tokens, counted as whitespace-delimited words
+# (the embedding tokenizer produces ~1.3 subword tokens per word)
+CHUNK_TARGET_TOKENS = int(os.getenv('CHUNK_TARGET_TOKENS', 128))
+CHUNK_OVERLAP_TOKENS = int(os.getenv('CHUNK_OVERLAP_TOKENS', 16))
+CHUNK_MIN_TOKENS = int(os.getenv('CHUNK_MIN_TOKENS', 8))
+
+TOKEN_RE = re.compile(r"\S+")
+# Sentence terminator or line break plus any following whitespace. A single
+# character class up front keeps the scan fast; _segment classifies each match
+BOUNDARY_RE = re.compile(r"[.!?\n]\s*")
+HEADING_RE = re.compile(
+    r"[ \t]*(?:"
+    r"(?:\d+(?:\.\d+)*\.?|[A-Z]\.|[IVXivx]+\.|\([a-z0-9]+\))[ \t]+\S"
+    r"|(?:SECTION|Section|PART|Part|CHAPTER|Chapter|ARTICLE|Article|SCHEDULE|Schedule|ANNEXURE|Annexure)\b"
+    r"|[A-Z][A-Z0-9 ,&/()'\-]{3,}$"
+    r")",
+    re.MULTILINE
+)
+MAX_HEADING_CHARS = 100
+
+
+def count_tokens(text, start=0, end=None):
+    """Approximate token count of text[start:end] without copying it"""
+    return len(TOKEN_RE.findall(text, start, len(text) if end is None else end))
+
+
+def chunker_signature(target_tokens=CHUNK_TARGET_TOKENS, overlap_tokens=CHUNK_OVERLAP_TOKENS,
+                      min_tokens=CHUNK_MIN_TOKENS):
+    """Identifies the chunking rules in the on-disk extraction cache; bump the version on changes"""
+    return f"tokens-v1:{target_tokens}:{overlap_tokens}:{min_tokens}"
+
+
+CHUNKER_SIGNATURE = chunker_signature()
+
+
+class Chunker:
+    """
+    Incremental, offset-based chunker.
+
+    Text is scanned once and split into units (sentences, with headings as
+    their own units). Units are packed greedily into chunks of up to
+    target_tokens, with the trailing ~overlap_tokens of each chunk repeated
+    at the start of the next. A heading always starts a new chunk. Chunks
+    are exact slices of the fed text and are returned as (start, end, chunk)
+    tuples with offsets into the concatenation of everything fed so far.
+    """
+
+    def __init__(self, target_tokens=CHUNK_TARGET_TOKENS, overlap_tokens=CHUNK_OVERLAP_TOKENS,
+                 min_tokens=CHUNK_MIN_TOKENS):
+        if overlap_tokens >= target_tokens:
+            raise ValueError("overlap_tokens must be smaller than target_tokens")
+        self.target_tokens = target_tokens
+        self.overlap_tokens = overlap_tokens
+        self.min_tokens = min_tokens
+
+        self._buffer = ""      # Unconsumed text, starting at document offset self._base
+        self._base = 0
+        self._scan = 0         # Buffer position up to which units have been cut
+        self._unit_start = 0   # Buffer position where the current unit began
+        self._in_heading = False
+
+        self._units = []       # Open chunk: [(start, end, tokens)] in document offsets
+        self._tokens = 0
+        self.dropped = 0       # Chunks below min_tokens that were skipped
+
+    # Segmentation
+
+    def feed(self, text):
+        self._buffer += text
+        out = []
+        # Only cut boundaries that end before the last line break: anything
+        # later may still grow (more whitespace, or the rest of a heading line)
+        limit = self._buffer.rfind("\n")
+        if limit > self._scan:
+            self._segment(limit, out)
+        self._compact()
+        return out
+
+    def finish(self):
+        out = []
+        self._segment(None, out)
+        self._add_unit(self._unit_start, len(self._buffer), self._in_heading, out)
+        self._flush(out, carry=False)
+        self._base += len(self._buffer)
+        self._buffer, self._scan, self._unit_start = "", 0, 0
+        return out
+
+    def _segment(self, limit, out):
+        text = self._buffer
+        if self._base == 0 and self._scan == 0:
+            # The document may open with a heading
+            self._in_heading = self._is_heading(text, 0)
+        for match in BOUNDARY_RE.finditer(text, self._scan):
+            if limit is not None and match.end() >= limit:
+                self._scan = match.start()
+                return
+            boundary = match.group()
+            if boundary[0] == "\n":
+                unit_end = match.start()
+            elif len(boundary) > 1:
+                unit_end = match.start() + 1  # Keep the full stop with its sentence
+            else:
+                continue  # "3.5", "e.g" - not followed by whitespace
+            line_breaks = boundary.count("\n")
+            if self._in_heading and not line_breaks:
+                # "1. DEFINITIONS" - a heading runs to the end of its line
+                continue
+            next_start = match.end()
+            if line_breaks == 1 and boundary[0] == "\n" and not self._in_heading:
+                # A line wrap inside a sentence, unless the next line is a heading
+                if not self._is_heading(text, next_start):
+                    continue
+                self._add_unit(self._unit_start, unit_end, False, out)
+                self._in_heading = True
+            else:
+                # Sentence end or paragraph break
+                self._add_unit(self._unit_start, unit_end, self._in_heading, out)
+                self._in_heading = line_breaks > 0 and self._is_heading(text, next_start)
+            self._unit_start = next_start
+        self._scan = len(text) if limit is None else limit
+
+    @staticmethod
+    def _is_heading(text, pos):
+        line_end = text.find("\n", pos, pos + MAX_HEADING_CHARS + 1)
+        if line_end == -1:
+            return False
+        line = text[pos:line_end].rstrip()
+        return bool(line) and line[-1] not in ".,;:" and HEADING_RE.match(line) is not None
+
+    def _compact(self):
+        """Drop buffer text that no open unit or chunk still needs"""
+        keep = self._unit_start
+        if self._units:
+            keep = min(keep, self._units[0][0] - self._base)
+        if keep > 0:
+            self._buffer = self._buffer[keep:]
+            self._base += keep
+            self._scan -= keep
+            self._unit_start -= keep
+
+    # Packing
+
+    def _add_unit(self, start, end, is_heading, out):
+        text = self._buffer
+        while start < end and text[start].isspace():
+            start += 1
+        while end > start and text[end - 1].isspace():
+            end -= 1
+        if start == end:
+            return
+        tokens = count_tokens(text, start, end)
+        start += self._base
+        end += self._base
+
+        if is_heading and self._tokens >= self.min_tokens:
+            self._flush(out, carry=False)
+        if tokens > self.target_tokens:
+            # A single oversized sentence: emit it in target-sized windows
+            self._flush(out, carry=False)
+            self._split_long_unit(start, end, out)
+            return
+        if self._tokens + tokens > self.target_tokens:
+            self._flush(out, carry=True)
+            if self._tokens + tokens > self.target_tokens:
+                self._units, self._tokens = [], 0
+        self._units.append((start, end, tokens))
+        self._tokens += tokens
+
+    def _split_long_unit(self, start, end, out):
+        base = self._base
+        window_start, count, last_end = start, 0, start
+        for match in TOKEN_RE.finditer(self._buffer, start - base, end - base):
+            if count == self.target_tokens:
+                self._emit(window_start, last_end, count, out)
+                window_start, count = match.start() + base, 0
+            count += 1
+            last_end = match.end() + base
+        self._emit(window_start, end, count, out)
+
+    def _flush(self, out, carry):
+        if not self._units:
+            return
+        self._emit(self._units[0][0], self._units[-1][1], self._tokens, out)
+        if not carry or self.overlap_tokens <= 0:
+            self._units, self._tokens = [], 0
+            return
+        # Keep the trailing units that fit in the overlap window
+        kept, kept_tokens = 0, 0
+        for unit in reversed(self._units):
+            if kept_tokens + unit[2] > self.overlap_tokens or kept + 1 == len(self._units):
+                break
+            kept += 1
+            kept_tokens += unit[2]
+        self._units = self._units[len(self._units) - kept:] if kept else []
+        self._tokens = kept_tokens
+
+    def _emit(self, start, end, tokens, out):
+        if tokens < self.min_tokens:
+            self.dropped += 1
+            return
+        out.append((start, end, self._buffer[start - self._base:end - self._base]))
+
+
+def chunk_spans(text, **kwargs):
+    """Chunk a complete text, returning (start, end, chunk) tuples"""
+    chunker = Chunker(**kwargs)
+    return chunker.feed(text) + chunker.finish()
+
+
+def chunk_text(text, **kwargs):
+    """Chunk a complete text, returning the chunk strings"""
+    return [chunk for _, _, chunk in chunk_spans(text, **kwargs)]
@@ -0,0 +1,183 @@
+# Corpus-level vector index over many documents, searchable by document id
+import os
+import bisect
+import logging
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+try:
+    from .vector_index import normalize, reconstruct_embeddings
+except ImportError:
+    from vector_index import normalize, reconstruct_embeddings
+
+logger = logging.getLogger(__name__)
+
+CORPUS_MAX_DOCUMENTS = int(os.getenv('CORPUS_MAX_DOCUMENTS', 64))
+
+
+class CorpusIndex:
+    """
+    One FAISS index holding the chunks of many documents.
+
+    Vectors are stored L2-normalized as fp16 in a scalar-quantizer index
+    wrapped in IndexIDMap2. Each document owns a contiguous range of vector
+    ids, so search can be restricted to a set of documents with an ID
+    selector (IDSelectorRange for one document, IDSelectorBatch for several)
+    in a single call. The least recently used documents are removed once
+    max_documents is exceeded, except documents pinned by a request that is
+    still using them (see acquire / release).
+    """
+
+    def __init__(self, max_documents=CORPUS_MAX_DOCUMENTS):
+        self.max_documents = max_documents
+        self._index = None
+        self._next_id = 0
+        self._documents = OrderedDict()  # doc_id -> (first vector id, chunks)
+        self._starts = []                # Sorted first ids, for id -> document lookups
+        self._owners = []
+        self._pins = {}                  # doc_id -> number of requests using it
+        self._lock = threading.RLock()
+
+    def __contains__(self, doc_id):
+        return doc_id in self._documents
+
+    @property
+    def ntotal(self):
+        return 0 if self._index is None else self._index.ntotal
+
+    def acquire(self, doc_ids):
+        """Pin the given documents that are held, so no other request evicts them; returns those"""
+        with self._lock:
+            held = [doc_id for doc_id in dict.fromkeys(doc_ids) if doc_id in self._documents]
+            for doc_id in held:
+                self._pin(doc_id)
+            return held
+
+    def release(self, doc_ids):
+        with self._lock:
+            for doc_id in doc_ids:
+                if self._pins.get(doc_id, 0) <= 1:
+                    self._pins.pop(doc_id, None)
+                else:
+                    self._pins[doc_id] -= 1
+            self._evict()
+
+    def _pin(self, doc_id):
+        self._pins[doc_id] = self._pins.get(doc_id, 0) + 1
+        self._documents.move_to_end(doc_id)
+
+    def _evict(self):
+        while len(self._documents) > self.max_documents:
+            victim = next((doc_id for doc_id in self._documents if doc_id not in self._pins), None)
+            if victim is None:
+                break  # Everything is in use; shrink back once requests release their documents
+            self.remove_document(victim)
+
+    def chunks(self, doc_id):
+        return self._documents[doc_id][1]
+
+    def add_document(self, doc_id, chunks, vectors, pin=False):
+        """
+        Add a document's chunks and their vectors under doc_id (no-op if
+        already present); pin=True also acquires it.
+        """
+        import faiss
+        with self._lock:
+            if doc_id in self._documents:
+                if pin:
+                    self._pin(doc_id)
+                self._documents.move_to_end(doc_id)
+                return
+            vectors = normalize(np.array(vectors, dtype=np.float32))
+            if self._index is None:
+                self._index = faiss.IndexIDMap2(faiss.IndexScalarQuantizer(
+                    vectors.shape[1], faiss.ScalarQuantizer.QT_fp16, faiss.METRIC_INNER_PRODUCT))
+            start = self._next_id
+            self._index.add_with_ids(vectors, np.arange(start, start + len(vectors), dtype=np.int64))
+            self._next_id += len(vectors)
+            self._documents[doc_id] = (start, chunks)
+            self._starts.append(start)
+            self._owners.append(doc_id)
+            if pin:
+                self._pin(doc_id)
+            self._evict()
+        logger.info(f"Added {len(chunks)} chunks of document {doc_id[:12]}... to the corpus index "
+                    f"({len(self._documents)} documents, {self.ntotal} vectors)")
+
+    def add_document_index(self, doc_id, chunks, embeddings, index, pin=False):
+        """Add a document from its per-document results, decoding vectors from its index if needed"""
+        with self._lock:
+            if doc_id in self._documents:
+                if pin:
+                    self._pin(doc_id)
+                self._documents.move_to_end(doc_id)
+                return
+        vectors = embeddings if embeddings is not None else reconstruct_embeddings(index)
+        self.add_document(doc_id, chunks, vectors, pin=pin)
+
+    def remove_document(self, doc_id):
+        import faiss
+        with self._lock:
+            start, chunks = self._documents.pop(doc_id)
+            self._index.remove_ids(faiss.IDSelectorRange(start, start + len(chunks)))
+            position = self._starts.index(start)
+            del self._starts[position]
+            del self._owners[position]
+
+    def _selector(self, doc_ids):
+        import faiss
+        ranges = [(self._documents[doc_id][0], len(self._documents[doc_id][1])) for doc_id in doc_ids]
+        if len(ranges) == 1:
+            start, count = ranges[0]
+            return faiss.IDSelectorRange(start, start + count)
+        ids = np.concatenate([np.arange(start, start + count, dtype=np.int64) for start, count in ranges])
+        return faiss.IDSelectorBatch(ids)
+
+    def search(self, query_embeddings, k, doc_ids=None):
+        """
+        Top-k chunks per query as lists of (doc_id, chunk, score), restricted
+        to doc_ids when given (unknown ids are ignored).
+        """
+        import faiss
+        with self._lock:
+            if doc_ids is not None:
+                doc_ids = [doc_id for doc_id in doc_ids if doc_id in self._documents]
+                if not doc_ids:
+                    return [[] for _ in range(len(np.atleast_2d(query_embeddings)))]
+            if self._index is None:
+                return [[] for _ in range(len(np.atleast_2d(query_embeddings)))]
+            params = faiss.SearchParameters(sel=self._selector(doc_ids)) if doc_ids else None
+            queries = normalize(np.array(np.atleast_2d(query_embeddings), dtype=np.float32))
+            scores, ids = self._index.search(queries, min(k, self.ntotal), params=params)
+            results = []
+            for row_scores, row_ids in zip(scores, ids):
+                row = []
+                for score, vector_id in zip(row_scores, row_ids):
+                    if vector_id < 0:
+                        continue
+                    owner = self._owners[bisect.bisect_right(self._starts, vector_id) - 1]
+                    start, chunks = self._documents[owner]
+                    row.append((owner, chunks[vector_id - start], float(score)))
+                results.append(row)
+            return results
+
+    def stats(self):
+        with self._lock:
+            return {'documents': len(self._documents), 'vectors': self.ntotal, 'max_documents': self.max_documents,
+                    'pinned': len(self._pins)}
+
+
+_corpus_index = None
+_corpus_lock = threading.Lock()
+
+
+def get_corpus_index():
+    """Get the process-wide corpus index"""
+    global _corpus_index
+    if _corpus_index is None:
+        with _corpus_lock:
+            if _corpus_index is None:
+                _corpus_index = CorpusIndex()
+    return _corpus_index
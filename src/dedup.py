@@ -0,0 +1,118 @@
+# Boilerplate and near-duplicate chunk elimination
+import os
+import re
+import zlib
+import hashlib
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# off | exact | near (exact hashes plus MinHash near-duplicate detection)
+DEDUP_MODE = os.getenv('DEDUP_MODE', 'near').lower()
+DEDUP_SIMILARITY = float(os.getenv('DEDUP_SIMILARITY', 0.8))  # Estimated Jaccard over word shingles
+
+SHINGLE_WORDS = 3
+NUM_PERM = 64
+LSH_BANDS = 16
+_PRIME = (1 << 31) - 1
+
+_WORD_RE = re.compile(r"\w+")
+_NUMBER_RE = re.compile(r"\d+(?:[.,]\d+)*")
+# Page counters are the one number that legitimately differs between repeated footers
+_PAGE_NUMBER_RE = re.compile(r"\bpage\s*(?:no\.?\s*)?\d+(?:\s*(?:of|/)\s*\d+)?", re.IGNORECASE)
+
+_rng = np.random.RandomState(1)
+_PERM_A = _rng.randint(1, _PRIME, size=NUM_PERM).astype(np.uint64)
+_PERM_B = _rng.randint(0, _PRIME, size=NUM_PERM).astype(np.uint64)
+
+
+def normalize_chunk(text):
+    """Case-, whitespace- and page-number-insensitive form used for duplicate detection"""
+    return " ".join(_PAGE_NUMBER_RE.sub("page #", text).lower().split())
+
+
+def minhash_signature(words):
+    """MinHash signature of the word shingles of a chunk"""
+    if len(words) <= SHINGLE_WORDS:
+        shingles = [" ".join(words)]
+    else:
+        shingles = [" ".join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)]
+    hashes = np.fromiter((zlib.crc32(s.encode('utf-8')) % _PRIME for s in shingles),
+                         dtype=np.uint64, count=len(shingles))
+    return ((_PERM_A[:, None] * hashes[None, :] + _PERM_B[:, None]) % _PRIME).min(axis=1)
+
+
+class ChunkDeduplicator:
+    """
+    Collapses repeated chunks (headers, footers, disclaimers, captions) to a
+    single representative before embedding.
+
+    Chunks are added in document order. Exact duplicates are found by hash
+    of the normalized text; near-duplicates by MinHash + LSH banding, and are
+    only merged when their numbers match exactly, so clauses that differ in
+    an amount or a period are never collapsed. back_refs[i] is the index of
+    the representative (in the deduplicated list) for the i-th chunk added.
+    """
+
+    def __init__(self, mode=DEDUP_MODE, threshold=DEDUP_SIMILARITY):
+        self.mode = mode
+        self.threshold = threshold
+        self.back_refs = []
+        self._representatives = 0
+        self._exact = {}
+        self._signatures = []
+        self._numbers = []
+        self._buckets = {}
+
+    @property
+    def duplicates(self):
+        return len(self.back_refs) - self._representatives
+
+    def add(self, chunk):
+        """Register a chunk; returns True if it is new and should be embedded"""
+        if self.mode == 'off':
+            return self._new(None, None, None)
+
+        normalized = normalize_chunk(chunk)
+        key = hashlib.sha1(normalized.encode('utf-8')).digest()
+        rep = self._exact.get(key)
+        if rep is not None:
+            self.back_refs.append(rep)
+            return False
+        if self.mode != 'near':
+            self._exact[key] = self._representatives
+            return self._new(None, None, None)
+
+        signature = minhash_signature(_WORD_RE.findall(normalized))
+        numbers = tuple(_NUMBER_RE.findall(normalized))
+        band_keys = [(band, signature[band::LSH_BANDS].tobytes()) for band in range(LSH_BANDS)]
+        for band_key in band_keys:
+            rep = self._buckets.get(band_key)
+            if rep is not None and self._numbers[rep] == numbers and \
+                    np.mean(self._signatures[rep] == signature) >= self.threshold:
+                self._exact[key] = rep
+                self.back_refs.append(rep)
+                return False
+
+        self._exact[key] = self._representatives
+        return self._new(signature, numbers, band_keys)
+
+    def _new(self, signature, numbers, band_keys):
+        rep = self._representatives
+        if signature is not None:
+            self._signatures.append(signature)
+            self._numbers.append(numbers)
+            for band_key in band_keys:
+                self._buckets.setdefault(band_key, rep)
+        self.back_refs.append(rep)
+        self._representatives += 1
+        return True
+
+
+def deduplicate_chunks(chunks, mode=DEDUP_MODE, threshold=DEDUP_SIMILARITY):
+    """Return (unique_chunks, back_refs) for a complete list of chunks"""
+    dedup = ChunkDeduplicator(mode, threshold)
+    unique = [chunk for chunk in chunks if dedup.add(chunk)]
+    return unique, dedup.back_refs
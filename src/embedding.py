@@ -0,0 +1,239 @@
+# Embedding stage: model backends plus length-sorted, batch-tunable encoding
+import os
+import json
+import shutil
+import logging
+import threading
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_MODEL_NAME = os.getenv('EMBEDDING_MODEL', 'BAAI/bge-large-en-v1.5')
+# torch | torch-int8 | onnx | onnx-int8
+EMBEDDING_BACKEND = os.getenv('EMBEDDING_BACKEND', 'torch').lower()
+# Where exported / quantized ONNX models are kept between runs
+ONNX_MODEL_DIR = os.getenv('ONNX_MODEL_DIR', os.path.join('cache', 'onnx'))
+
+EMBED_BATCH_SIZE = int(os.getenv('EMBED_BATCH_SIZE', 32))
+# 0 keeps encoding in-process; N > 0 fans large inputs out over N local worker processes
+EMBED_POOL_WORKERS = int(os.getenv('EMBED_POOL_WORKERS', 0))
+EMBED_POOL_MIN_TEXTS = int(os.getenv('EMBED_POOL_MIN_TEXTS', 128))
+
+_pool = None
+_pool_model = None
+_pool_lock = threading.Lock()
+
+
+def _read_pooling_config(model_name, local_dir=None):
+    """Pooling mode and normalization from the SentenceTransformers model config (bge: CLS + normalize)"""
+    pooling, normalize = 'cls', True
+
+    def read_json(filename):
+        local_path = os.path.join(local_dir, filename) if local_dir else None
+        if local_path and os.path.exists(local_path):
+            path = local_path
+        else:
+            from huggingface_hub import hf_hub_download
+            path = hf_hub_download(model_name, filename)
+        with open(path) as f:
+            return json.load(f)
+
+    try:
+        modules = read_json('modules.json')
+        normalize = any(m.get('type', '').endswith('Normalize') for m in modules)
+        pooling_dir = next((m['path'] for m in modules if m.get('type', '').endswith('Pooling')), '1_Pooling')
+        config = read_json(f"{pooling_dir}/config.json")
+        pooling = 'cls' if config.get('pooling_mode_cls_token') else 'mean'
+    except Exception as e:
+        logger.warning(f"Could not read pooling config for {model_name}, assuming CLS + normalize: {e}")
+    return pooling, normalize
+
+
+def onnx_export_dir(model_name, model_dir=ONNX_MODEL_DIR):
+    return os.path.join(model_dir, model_name.replace('/', '__'))
+
+
+class OnnxSentenceEncoder:
+    """
+    ONNX Runtime sentence encoder exposing the subset of the SentenceTransformer
+    API the app uses (encode, get_sentence_embedding_dimension, tokenizer,
+    max_seq_length). With quantize=True the exported graph is converted to
+    dynamic int8 (weights int8, activations quantized on the fly).
+    """
+
+    def __init__(self, model_name, quantize=False, export_dir=None, max_seq_length=512):
+        try:
+            import onnxruntime as ort
+            from transformers import AutoTokenizer
+        except ImportError as e:
+            raise ImportError("EMBEDDING_BACKEND=onnx requires onnxruntime and optimum[onnxruntime]") from e
+
+        export_dir = export_dir or onnx_export_dir(model_name)
+        onnx_path = self._ensure_exported(model_name, export_dir)
+        if quantize:
+            onnx_path = self._ensure_quantized(onnx_path)
+
+        self.model_name = model_name
+        self.tokenizer = AutoTokenizer.from_pretrained(export_dir)
+        self.max_seq_length = min(max_seq_length, self.tokenizer.model_max_length)
+        self.pooling, self.normalize = _read_pooling_config(model_name, export_dir)
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(onnx_path, options, providers=['CPUExecutionProvider'])
+        self._input_names = {i.name for i in self.session.get_inputs()}
+        self._dimension = None
+        logger.info(f"ONNX encoder ready: {onnx_path} (pooling={self.pooling}, normalize={self.normalize})")
+
+    @staticmethod
+    def _ensure_exported(model_name, export_dir):
+        onnx_path = os.path.join(export_dir, 'model.onnx')
+        if not os.path.exists(onnx_path):
+            from optimum.onnxruntime import ORTModelForFeatureExtraction
+            from transformers import AutoTokenizer
+            logger.info(f"Exporting {model_name} to ONNX (first time only)...")
+            ORTModelForFeatureExtraction.from_pretrained(model_name, export=True).save_pretrained(export_dir)
+            AutoTokenizer.from_pretrained(model_name).save_pretrained(export_dir)
+            # Keep the SentenceTransformers pooling config beside the graph so loading needs no hub access
+            try:
+                from huggingface_hub import hf_hub_download
+                modules_path = hf_hub_download(model_name, 'modules.json')
+                with open(modules_path) as f:
+                    modules = json.load(f)
+                for filename in ['modules.json'] + [f"{m['path']}/config.json" for m in modules
+                                                    if m.get('type', '').endswith('Pooling')]:
+                    target = os.path.join(export_dir, filename)
+                    os.makedirs(os.path.dirname(target), exist_ok=True)
+                    shutil.copyfile(hf_hub_download(model_name, filename), target)
+            except Exception as e:
+                logger.warning(f"Could not store pooling config for {model_name}: {e}")
+        return onnx_path
+
+    @staticmethod
+    def _ensure_quantized(onnx_path):
+        quantized_path = onnx_path.replace('model.onnx', 'model_int8.onnx')
+        if not os.path.exists(quantized_path):
+            from onnxruntime.quantization import quantize_dynamic, QuantType
+            logger.info("Quantizing ONNX model to dynamic int8 (first time only)...")
+            quantize_dynamic(onnx_path, quantized_path, weight_type=QuantType.QInt8)
+        return quantized_path
+
+    def get_sentence_embedding_dimension(self):
+        if self._dimension is None:
+            self._dimension = self.encode(["dimension probe"]).shape[1]
+        return self._dimension
+
+    def encode(self, sentences, batch_size=32, convert_to_numpy=True, show_progress_bar=False, **kwargs):
+        single = isinstance(sentences, str)
+        if single:
+            sentences = [sentences]
+        outputs = []
+        for start in range(0, len(sentences), batch_size):
+            batch = self.tokenizer(sentences[start:start + batch_size], padding=True, truncation=True,
+                                   max_length=self.max_seq_length, return_tensors='np')
+            feed = {name: batch[name].astype(np.int64) for name in batch if name in self._input_names}
+            hidden = self.session.run(None, feed)[0]
+            if self.pooling == 'cls':
+                pooled = hidden[:, 0]
+            else:
+                mask = batch['attention_mask'][..., None].astype(np.float32)
+                pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            if self.normalize:
+                pooled = pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+            outputs.append(pooled.astype(np.float32))
+        embeddings = np.vstack(outputs) if outputs else np.zeros((0, 0), dtype=np.float32)
+        return embeddings[0] if single else embeddings
+
+
+def load_embedding_model(model_name=EMBEDDING_MODEL_NAME, backend=EMBEDDING_BACKEND, local_path=None):
+    """
+    Load the sentence encoder for the configured backend.
+
+    local_path points at a pre-exported copy of the model (see model_artifacts.py);
+    the model name still identifies its vectors in the embedding store.
+    """
+    if backend not in ('torch', 'torch-int8', 'onnx', 'onnx-int8'):
+        raise ValueError(f"Unknown EMBEDDING_BACKEND '{backend}' (expected torch, torch-int8, onnx or onnx-int8)")
+    logger.info(f"Loading embedding model {model_name} with backend '{backend}'"
+                f"{f' from {local_path}' if local_path else ''}...")
+    if backend in ('onnx', 'onnx-int8'):
+        model = OnnxSentenceEncoder(model_name, quantize=backend == 'onnx-int8', export_dir=local_path)
+        model.embedding_key = f"{model_name}:{backend}"
+        return model
+
+    from sentence_transformers import SentenceTransformer
+    model = SentenceTransformer(local_path or model_name, device='cpu' if backend == 'torch-int8' else None)
+    if backend == 'torch-int8':
+        import torch
+        # Dynamic int8 quantization of every Linear layer (CPU only)
+        torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+    # Names the vectors this model produces in the persistent embedding store
+    model.embedding_key = f"{model_name}:{backend}"
+    return model
+
+
+def _token_lengths(model, texts):
+    """Token length per text, from the model's tokenizer when it has one"""
+    tokenizer = getattr(model, 'tokenizer', None)
+    if tokenizer is not None:
+        try:
+            max_length = getattr(model, 'max_seq_length', None) or 512
+            encoded = tokenizer(list(texts), add_special_tokens=False, truncation=True, max_length=max_length)
+            return np.fromiter((len(ids) for ids in encoded['input_ids']), dtype=np.int64, count=len(texts))
+        except Exception as e:
+            logger.debug(f"Tokenizer length lookup failed, falling back to word counts: {e}")
+    return np.fromiter((len(text.split()) for text in texts), dtype=np.int64, count=len(texts))
+
+
+def get_encode_pool(model):
+    """Get the shared multi-process encode pool for a model, starting it on first use"""
+    global _pool, _pool_model
+    if _pool is None or _pool_model is not model:
+        with _pool_lock:
+            if _pool is not None and _pool_model is not model:
+                model.stop_multi_process_pool(_pool)
+                _pool = None
+            if _pool is None:
+                logger.info(f"Starting embedding pool with {EMBED_POOL_WORKERS} CPU workers...")
+                _pool = model.start_multi_process_pool(target_devices=['cpu'] * EMBED_POOL_WORKERS)
+                _pool_model = model
+    return _pool
+
+
+def shutdown_encode_pool():
+    global _pool, _pool_model
+    with _pool_lock:
+        if _pool is not None:
+            _pool_model.stop_multi_process_pool(_pool)
+            _pool, _pool_model = None, None
+
+
+def encode_texts(model, texts, batch_size=EMBED_BATCH_SIZE):
+    """
+    Encode texts with minimal padding waste.
+
+    Inputs are sorted by token length so each batch holds similarly sized
+    texts, encoded with the configured batch size (over the process pool for
+    large inputs when EMBED_POOL_WORKERS is set), and returned as a float32
+    array in the original order.
+    """
+    if len(texts) == 0:
+        return np.zeros((0, model.get_sentence_embedding_dimension()), dtype=np.float32)
+
+    order = np.argsort(-_token_lengths(model, texts), kind='stable')
+    sorted_texts = [texts[i] for i in order]
+
+    use_pool = (EMBED_POOL_WORKERS > 0 and len(texts) >= EMBED_POOL_MIN_TEXTS
+                and hasattr(model, 'start_multi_process_pool'))
+    if use_pool:
+        pool = get_encode_pool(model)
+        chunk_size = max(batch_size, -(-len(texts) // (EMBED_POOL_WORKERS * 4)))
+        sorted_embeddings = model.encode_multi_process(sorted_texts, pool, batch_size=batch_size,
+                                                       chunk_size=chunk_size)
+    else:
+        sorted_embeddings = model.encode(sorted_texts, batch_size=batch_size, convert_to_numpy=True)
+
+    embeddings = np.empty_like(sorted_embeddings, dtype=np.float32)
+    embeddings[order] = sorted_embeddings
+    return embeddings
@@ -0,0 +1,140 @@
+# Persistent chunk-embedding store keyed by (embedding model, chunk text hash)
+import os
+import hashlib
+import logging
+import sqlite3
+import threading
+
+import numpy as np
+
+try:
+    from .embedding import encode_texts
+except ImportError:
+    from embedding import encode_texts
+
+logger = logging.getLogger(__name__)
+
+# Empty disables the store
+EMBEDDING_STORE_PATH = os.getenv('EMBEDDING_STORE_PATH', os.path.join('cache', 'embeddings.sqlite3'))
+
+_SQLITE_MAX_VARS = 500  # Keys per lookup query, well under SQLite's bound-parameter limit
+
+
+def chunk_hash(text):
+    """Hash of the whitespace-normalized chunk (the tokenizer ignores whitespace differences)"""
+    return hashlib.sha1(" ".join(text.split()).encode('utf-8')).digest()
+
+
+def model_key(model):
+    """Identifies the embedding model and backend, or None if the model is unnamed"""
+    return getattr(model, 'embedding_key', None)
+
+
+class EmbeddingStore:
+    """
+    SQLite-backed map of (model key, chunk hash) -> float32 vector.
+
+    Shared wording (standard exclusions, definitions, regulator clauses) is
+    encoded once per model and then looked up for every later document.
+    """
+
+    def __init__(self, path=EMBEDDING_STORE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "model TEXT NOT NULL, hash BLOB NOT NULL, vector BLOB NOT NULL, "
+            "PRIMARY KEY (model, hash)) WITHOUT ROWID"
+        )
+        self._conn.commit()
+
+    def get_many(self, key, hashes):
+        """Return {hash: vector} for the hashes that are stored"""
+        found = {}
+        unique = list(set(hashes))
+        with self._lock:
+            for start in range(0, len(unique), _SQLITE_MAX_VARS):
+                part = unique[start:start + _SQLITE_MAX_VARS]
+                rows = self._conn.execute(
+                    f"SELECT hash, vector FROM embeddings WHERE model = ? AND hash IN ({','.join('?' * len(part))})",
+                    [key, *part]
+                )
+                for digest, vector in rows:
+                    found[digest] = np.frombuffer(vector, dtype=np.float32)
+        return found
+
+    def put_many(self, key, hashes, vectors):
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, hash, vector) VALUES (?, ?, ?)",
+                [(key, digest, vector.tobytes()) for digest, vector in zip(hashes, vectors)]
+            )
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_embedding_store():
+    """Get the shared embedding store, or None when it is disabled or unavailable"""
+    global _store
+    if _store is None and EMBEDDING_STORE_PATH:
+        with _store_lock:
+            if _store is None:
+                try:
+                    _store = EmbeddingStore(EMBEDDING_STORE_PATH)
+                    logger.info(f"Embedding store opened at {EMBEDDING_STORE_PATH}")
+                except Exception as e:
+                    logger.warning(f"Embedding store disabled, could not open {EMBEDDING_STORE_PATH}: {e}")
+                    _store = False
+    return _store or None
+
+
+def encode_chunks(model, texts):
+    """
+    Encode chunks, reusing stored embeddings.
+
+    Only chunks not yet in the store for this model are encoded; their
+    vectors are written back so later documents can reuse them.
+    """
+    key = model_key(model)
+    store = get_embedding_store() if key else None
+    if store is None or len(texts) == 0:
+        return encode_texts(model, texts)
+
+    hashes = [chunk_hash(text) for text in texts]
+    try:
+        found = store.get_many(key, hashes)
+    except Exception as e:
+        logger.warning(f"Embedding store lookup failed, encoding everything: {e}")
+        return encode_texts(model, texts)
+
+    missing = [i for i, digest in enumerate(hashes) if digest not in found]
+    if not missing:
+        return np.vstack([found[digest] for digest in hashes])
+
+    encoded = encode_texts(model, [texts[i] for i in missing])
+    embeddings = np.empty((len(texts), encoded.shape[1]), dtype=np.float32)
+    embeddings[missing] = encoded
+    for i, digest in enumerate(hashes):
+        if digest in found:
+            embeddings[i] = found[digest]
+
+    try:
+        store.put_many(key, [hashes[i] for i in missing], encoded)
+    except Exception as e:
+        logger.warning(f"Could not write embeddings to the store: {e}")
+    logger.debug(f"Embedding store: reused {len(texts) - len(missing)} of {len(texts)} chunk embeddings")
+    return embeddings
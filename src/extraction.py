@@ -0,0 +1,134 @@
+# Parallel PDF text extraction
+import io
+import os
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+import pdfplumber
+try:
+    import fitz  # PyMuPDF for fast PDF extraction
+    # Verify it's the correct PyMuPDF module
+    if not hasattr(fitz, 'open'):
+        raise ImportError("Wrong fitz module loaded")
+except (ImportError, AttributeError):
+    # Fallback: Try importing PyMuPDF directly
+    try:
+        import pymupdf as fitz
+    except ImportError:
+        # Final fallback: use pdfplumber only
+        fitz = None
+        logger.warning("PyMuPDF not available, will use pdfplumber only")
+
+# Documents with fewer pages than this are extracted in-process;
+# below it the pool start-up and IPC cost outweighs the parallel speedup
+PARALLEL_PAGE_THRESHOLD = int(os.getenv('PDF_PARALLEL_PAGE_THRESHOLD', 64))
+PDF_EXTRACT_WORKERS = int(os.getenv('PDF_EXTRACT_WORKERS', os.cpu_count() or 1))
+MIN_PAGES_PER_TASK = 16
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _is_buffer(source):
+    return isinstance(source, (bytes, bytearray, memoryview))
+
+
+def _count_pages(source):
+    if fitz is not None:
+        doc = fitz.open(stream=source, filetype="pdf") if _is_buffer(source) else fitz.open(source)
+        try:
+            return doc.page_count
+        finally:
+            doc.close()
+    with pdfplumber.open(io.BytesIO(source) if _is_buffer(source) else source) as pdf:
+        return len(pdf.pages)
+
+
+def _extract_page_range(source, start, end):
+    """Open the document and return the text of pages [start, end) in order"""
+    texts = []
+    if fitz is not None:
+        doc = fitz.open(stream=source, filetype="pdf") if _is_buffer(source) else fitz.open(source)
+        try:
+            for page_no in range(start, end):
+                texts.append(doc[page_no].get_text())
+        finally:
+            doc.close()
+    else:
+        with pdfplumber.open(io.BytesIO(source) if _is_buffer(source) else source) as pdf:
+            for page in pdf.pages[start:end]:
+                page_text = page.extract_text()
+                texts.append(page_text + "\n" if page_text else "")
+    return texts
+
+
+def get_extraction_pool():
+    """Get the shared extraction process pool, creating it on first use"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                logger.info(f"Starting PDF extraction pool with {PDF_EXTRACT_WORKERS} workers...")
+                # spawn, not fork: the parent has torch/tokenizer threads running
+                _pool = ProcessPoolExecutor(
+                    max_workers=PDF_EXTRACT_WORKERS,
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+    return _pool
+
+
+def shutdown_extraction_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def _split_ranges(page_count, workers):
+    """Split pages into one contiguous range per worker so each opens the document once"""
+    per_task = max(MIN_PAGES_PER_TASK, -(-page_count // workers))
+    return [(start, min(start + per_task, page_count)) for start in range(0, page_count, per_task)]
+
+
+def iter_pdf_page_batches(source, max_pages=None):
+    """
+    Yield lists of page texts in page order.
+
+    Small documents are read in-process as a single batch; larger ones are split
+    into page ranges that are extracted concurrently by the worker pool, each
+    worker opening the document itself. Batches are yielded as soon as they and
+    every batch before them are done, so callers can start on early pages.
+    """
+    page_count = _count_pages(source)
+    if max_pages is not None and page_count > max_pages:
+        raise Exception(f"Document has {page_count} pages, limit is {max_pages}")
+
+    if page_count < PARALLEL_PAGE_THRESHOLD or PDF_EXTRACT_WORKERS <= 1:
+        yield _extract_page_range(source, 0, page_count)
+        return
+
+    ranges = _split_ranges(page_count, PDF_EXTRACT_WORKERS)
+    logger.info(f"Extracting {page_count} pages in {len(ranges)} parallel ranges")
+    if isinstance(source, memoryview):
+        source = source.tobytes()
+    pool = get_extraction_pool()
+    futures = [pool.submit(_extract_page_range, source, start, end) for start, end in ranges]
+    try:
+        for future in futures:
+            yield future.result()
+    finally:
+        for future in futures:
+            future.cancel()
+
+
+def extract_pdf_pages(source, max_pages=None):
+    """Return the text of every page, in order"""
+    pages = []
+    for batch in iter_pdf_page_batches(source, max_pages=max_pages):
+        pages.extend(batch)
+    return pages
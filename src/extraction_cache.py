@@ -0,0 +1,107 @@
+# Persistent on-disk cache of extracted text and chunk boundaries
+import os
+import gzip
+import json
+import logging
+import tempfile
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Empty disables the cache
+EXTRACTION_CACHE_DIR = os.getenv('EXTRACTION_CACHE_DIR', os.path.join('cache', 'extraction'))
+
+_write_lock = threading.Lock()
+
+
+class ExtractionRecord:
+    """
+    Normalized document text with page and chunk offsets.
+
+    Pages are stored as end offsets into the text, chunkings as flat
+    [start, end, start, end, ...] offset lists keyed by chunker signature,
+    so the same extraction can be re-chunked or re-embedded without
+    touching the original document.
+    """
+
+    def __init__(self, text, page_ends, chunkings=None):
+        self.text = text
+        self.page_ends = page_ends
+        self.chunkings = chunkings or {}
+
+    @classmethod
+    def from_pages(cls, pages):
+        page_ends = []
+        total = 0
+        for page in pages:
+            total += len(page)
+            page_ends.append(total)
+        return cls("".join(pages), page_ends)
+
+    def pages(self):
+        start = 0
+        for end in self.page_ends:
+            yield self.text[start:end]
+            start = end
+
+    def chunk_spans(self, signature):
+        flat = self.chunkings.get(signature)
+        if flat is None:
+            return None
+        return list(zip(flat[0::2], flat[1::2]))
+
+    def chunks(self, signature):
+        spans = self.chunk_spans(signature)
+        if spans is None:
+            return None
+        return [self.text[start:end] for start, end in spans]
+
+    def set_chunk_spans(self, signature, spans):
+        self.chunkings[signature] = [offset for span in spans for offset in span]
+
+
+def _record_path(content_hash, extractor_version):
+    return os.path.join(EXTRACTION_CACHE_DIR, content_hash[:2], f"{content_hash}.v{extractor_version}.json.gz")
+
+
+def load(content_hash, extractor_version):
+    """Load the cached extraction for a document, or None"""
+    if not EXTRACTION_CACHE_DIR:
+        return None
+    path = _record_path(content_hash, extractor_version)
+    try:
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable extraction cache entry {path}: {e}")
+        return None
+    return ExtractionRecord(data['text'], data['page_ends'], data.get('chunkings'))
+
+
+def save(content_hash, extractor_version, record):
+    """Atomically write an extraction record (last writer wins)"""
+    if not EXTRACTION_CACHE_DIR:
+        return
+    path = _record_path(content_hash, extractor_version)
+    payload = {
+        'extractor_version': extractor_version,
+        'text': record.text,
+        'page_ends': record.page_ends,
+        'chunkings': record.chunkings
+    }
+    try:
+        with _write_lock:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as raw, gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=5) as f:
+                    f.write(json.dumps(payload, separators=(',', ':')).encode('utf-8'))
+                os.replace(tmp_path, path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+        logger.info(f"Saved extraction cache entry for content {content_hash[:12]}...")
+    except Exception as e:
+        logger.warning(f"Could not write extraction cache entry {path}: {e}")
@@ -0,0 +1,93 @@
+# Shared, pooled HTTP client for document downloads
+import os
+import logging
+import threading
+from collections import OrderedDict
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+HTTP_POOL_SIZE = int(os.getenv('HTTP_POOL_SIZE', 10))
+HTTP_RETRIES = int(os.getenv('HTTP_RETRIES', 2))
+VALIDATOR_CACHE_SIZE = int(os.getenv('VALIDATOR_CACHE_SIZE', 32))
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_http_session():
+    """Get the process-wide requests session (keep-alive connection pool), creating it on first use"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                retry = Retry(
+                    total=HTTP_RETRIES,
+                    backoff_factor=0.5,
+                    status_forcelist=[502, 503, 504],
+                    allowed_methods=['GET', 'HEAD']
+                )
+                adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE, max_retries=retry)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                _session = session
+                logger.info(f"HTTP session created (pool size {HTTP_POOL_SIZE})")
+    return _session
+
+
+def extract_validators(headers):
+    """Pull the ETag / Last-Modified validators out of a response"""
+    validators = {
+        'etag': headers.get('ETag'),
+        'last_modified': headers.get('Last-Modified')
+    }
+    return validators if any(validators.values()) else None
+
+
+def conditional_headers(validators):
+    """Build If-None-Match / If-Modified-Since request headers from stored validators"""
+    headers = {}
+    if not validators:
+        return headers
+    if validators.get('etag'):
+        headers['If-None-Match'] = validators['etag']
+    if validators.get('last_modified'):
+        headers['If-Modified-Since'] = validators['last_modified']
+    return headers
+
+
+class ValidatorStore:
+    """
+    Bounded LRU map of URL -> response validators plus the processed payload
+    (e.g. chunks) that was built from that response. Outlives _document_cache
+    entries so a 304 Not Modified can skip the download and extraction.
+    """
+
+    def __init__(self, max_size=VALIDATOR_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, url):
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is not None:
+                self._entries.move_to_end(url)
+            return entry
+
+    def put(self, url, validators, **payload):
+        if not validators:
+            return
+        with self._lock:
+            self._entries[url] = dict(validators, **payload)
+            self._entries.move_to_end(url)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def discard(self, url):
+        with self._lock:
+            self._entries.pop(url, None)
@@ -0,0 +1,131 @@
+# Persistent on-disk store of document indexes, reopened memory-mapped
+import os
+import json
+import shutil
+import hashlib
+import logging
+import tempfile
+
+import numpy as np
+
+try:
+    from .chunking import CHUNKER_SIGNATURE
+    from .dedup import DEDUP_MODE, DEDUP_SIMILARITY
+    from .vector_index import VECTOR_STORAGE, INDEX_TYPE, NumpyIndex, set_search_params
+except ImportError:
+    from chunking import CHUNKER_SIGNATURE
+    from dedup import DEDUP_MODE, DEDUP_SIMILARITY
+    from vector_index import VECTOR_STORAGE, INDEX_TYPE, NumpyIndex, set_search_params
+
+logger = logging.getLogger(__name__)
+
+# Empty disables the store
+INDEX_STORE_DIR = os.getenv('INDEX_STORE_DIR', os.path.join('cache', 'indexes'))
+
+INDEX_FILE = 'index.faiss'
+VECTORS_FILE = 'vectors.npy'
+SCALES_FILE = 'scales.npy'
+EMBEDDINGS_FILE = 'embeddings.npy'
+META_FILE = 'meta.json'
+
+
+def index_signature(model, extractor_version):
+    """
+    Everything that determines a document's index besides its content, or
+    None for models without an embedding key (their vectors can't be named).
+    """
+    embedding_key = getattr(model, 'embedding_key', None)
+    if embedding_key is None:
+        return None
+    return (f"extractor-{extractor_version}|{embedding_key}|{CHUNKER_SIGNATURE}|"
+            f"dedup-{DEDUP_MODE}:{DEDUP_SIMILARITY}|{VECTOR_STORAGE}|{INDEX_TYPE}")
+
+
+def _entry_dir(content_hash, signature):
+    digest = hashlib.sha1(signature.encode('utf-8')).hexdigest()[:16]
+    return os.path.join(INDEX_STORE_DIR, content_hash[:2], f"{content_hash}-{digest}")
+
+
+def save(content_hash, extractor_version, model, chunks, embeddings, index, chunk_refs=None):
+    """
+    Write a document's chunks and index into a new entry directory and
+    rename it into place, so readers never see a partial entry.
+    """
+    signature = index_signature(model, extractor_version)
+    if not INDEX_STORE_DIR or signature is None:
+        return
+    import faiss
+    path = _entry_dir(content_hash, signature)
+    if os.path.isdir(path):
+        return
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = tempfile.mkdtemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            if isinstance(index, NumpyIndex):
+                np.save(os.path.join(tmp_path, VECTORS_FILE), index.vectors)
+                if index.scales is not None:
+                    np.save(os.path.join(tmp_path, SCALES_FILE), index.scales)
+            else:
+                faiss.write_index(index, os.path.join(tmp_path, INDEX_FILE))
+            if embeddings is not None:
+                np.save(os.path.join(tmp_path, EMBEDDINGS_FILE), embeddings)
+            with open(os.path.join(tmp_path, META_FILE), 'w', encoding='utf-8') as f:
+                json.dump({'signature': signature, 'chunks': chunks, 'chunk_refs': chunk_refs}, f)
+            os.rename(tmp_path, path)
+        except BaseException:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            raise
+        logger.info(f"Saved index for content {content_hash[:12]}... to the index store")
+    except Exception as e:
+        # Another worker may have stored the same document first
+        if not os.path.isdir(path):
+            logger.warning(f"Could not write index store entry {path}: {e}")
+
+
+def _read_index(path):
+    import faiss
+    # IO_FLAG_MMAP_IFC (faiss >= 1.8) reads the codes of every index type zero-copy from the
+    # mapped file, so vectors stay in the page cache shared by every worker; older builds only
+    # have IO_FLAG_MMAP, which maps flat / IVF codes. Entries are never modified once renamed
+    # into place.
+    flags = [faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY]
+    if hasattr(faiss, 'IO_FLAG_MMAP_IFC'):
+        flags.insert(0, faiss.IO_FLAG_MMAP_IFC | faiss.IO_FLAG_READ_ONLY)
+    for flag in flags:
+        try:
+            return faiss.read_index(path, flag)
+        except Exception as e:
+            logger.debug(f"Memory-mapped read (flags {flag:#x}) not supported for {path}: {e}")
+    logger.debug(f"Loading {path} into memory")
+    return faiss.read_index(path)
+
+
+def load(content_hash, extractor_version, model):
+    """Reopen a stored document index as (chunks, embeddings, index, chunk_refs), or None"""
+    signature = index_signature(model, extractor_version)
+    if not INDEX_STORE_DIR or signature is None:
+        return None
+    path = _entry_dir(content_hash, signature)
+    try:
+        with open(os.path.join(path, META_FILE), encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta['signature'] != signature:
+            return None
+        vectors_path = os.path.join(path, VECTORS_FILE)
+        if os.path.exists(vectors_path):
+            scales_path = os.path.join(path, SCALES_FILE)
+            scales = np.load(scales_path, mmap_mode='r') if os.path.exists(scales_path) else None
+            index = NumpyIndex.from_vectors(np.load(vectors_path, mmap_mode='r'), scales)
+        else:
+            index = _read_index(os.path.join(path, INDEX_FILE))
+            set_search_params(index)
+        embeddings_path = os.path.join(path, EMBEDDINGS_FILE)
+        embeddings = np.load(embeddings_path, mmap_mode='r') if os.path.exists(embeddings_path) else None
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable index store entry {path}: {e}")
+        return None
+    logger.info(f"Opened stored index for content {content_hash[:12]}... ({index.ntotal} vectors)")
+    return meta['chunks'], embeddings, index, meta['chunk_refs']
@@ -0,0 +1,116 @@
+# Process-wide LLM clients with pooled keep-alive connections
+import os
+import asyncio
+import logging
+import threading
+import importlib.util
+from weakref import WeakKeyDictionary
+
+logger = logging.getLogger(__name__)
+
+LLM_BASE_URL = os.getenv('LLM_BASE_URL', 'https://openrouter.ai/api/v1')
+LLM_MAX_CONNECTIONS = int(os.getenv('LLM_MAX_CONNECTIONS', 32))
+LLM_KEEPALIVE_CONNECTIONS = int(os.getenv('LLM_KEEPALIVE_CONNECTIONS', 16))
+LLM_KEEPALIVE_EXPIRY = float(os.getenv('LLM_KEEPALIVE_EXPIRY', 120))
+LLM_CONNECT_TIMEOUT = float(os.getenv('LLM_CONNECT_TIMEOUT', 5))
+LLM_READ_TIMEOUT = float(os.getenv('LLM_READ_TIMEOUT', 60))
+LLM_MAX_RETRIES = int(os.getenv('LLM_MAX_RETRIES', 2))
+# HTTP/2 multiplexes concurrent answers over one connection; needs the optional h2 package
+LLM_HTTP2 = os.getenv('LLM_HTTP2', '1') == '1' and importlib.util.find_spec('h2') is not None
+
+_lock = threading.Lock()
+_sync_clients = {}                       # api key -> (OpenAI, httpx.Client)
+_async_clients = WeakKeyDictionary()     # event loop -> {api key -> (AsyncOpenAI, httpx.AsyncClient)}
+
+
+def _http_options():
+    import httpx
+    return {
+        'http2': LLM_HTTP2,
+        'timeout': httpx.Timeout(LLM_READ_TIMEOUT, connect=LLM_CONNECT_TIMEOUT),
+        'limits': httpx.Limits(max_connections=LLM_MAX_CONNECTIONS,
+                               max_keepalive_connections=LLM_KEEPALIVE_CONNECTIONS,
+                               keepalive_expiry=LLM_KEEPALIVE_EXPIRY),
+    }
+
+
+def _sync_entry(api_key):
+    entry = _sync_clients.get(api_key)
+    if entry is None:
+        with _lock:
+            entry = _sync_clients.get(api_key)
+            if entry is None:
+                import httpx
+                from openai import OpenAI
+                http_client = httpx.Client(**_http_options())
+                entry = (OpenAI(api_key=api_key, base_url=LLM_BASE_URL, max_retries=LLM_MAX_RETRIES,
+                                http_client=http_client), http_client)
+                _sync_clients[api_key] = entry
+                logger.info(f"Created pooled LLM client for {LLM_BASE_URL} (http2={LLM_HTTP2})")
+    return entry
+
+
+def _async_entry(api_key):
+    loop = asyncio.get_running_loop()
+    with _lock:
+        clients = _async_clients.setdefault(loop, {})
+        entry = clients.get(api_key)
+        if entry is None:
+            import httpx
+            from openai import AsyncOpenAI
+            http_client = httpx.AsyncClient(**_http_options())
+            entry = (AsyncOpenAI(api_key=api_key, base_url=LLM_BASE_URL, max_retries=LLM_MAX_RETRIES,
+                                 http_client=http_client), http_client)
+            clients[api_key] = entry
+            logger.info(f"Created pooled async LLM client for {LLM_BASE_URL} (http2={LLM_HTTP2})")
+    return entry
+
+
+def get_sync_client(api_key):
+    """Shared thread-safe OpenAI client for api_key, created on first use"""
+    return _sync_entry(api_key)[0]
+
+
+def get_async_client(api_key):
+    """
+    Shared AsyncOpenAI client for api_key on the running event loop.
+
+    Async connections belong to the loop that opened them, so each loop gets
+    its own client; the server's single loop reuses one pool for every request.
+    """
+    return _async_entry(api_key)[0]
+
+
+def warm_up(api_key):
+    """Open a pooled connection (DNS, TCP and TLS) before the first question needs it"""
+    try:
+        _sync_entry(api_key)[1].head(LLM_BASE_URL)
+        logger.info("LLM client connection warmed up")
+    except Exception as e:
+        logger.warning(f"LLM client warm-up failed: {e}")
+
+
+async def warm_up_async(api_key):
+    try:
+        await _async_entry(api_key)[1].head(LLM_BASE_URL)
+        logger.info("Async LLM client connection warmed up")
+    except Exception as e:
+        logger.warning(f"Async LLM client warm-up failed: {e}")
+
+
+def close_clients():
+    """Close the pooled sync clients"""
+    with _lock:
+        clients = list(_sync_clients.values())
+        _sync_clients.clear()
+    for client, _ in clients:
+        client.close()
+
+
+async def aclose_clients():
+    """Close the pooled clients of the running event loop and the sync clients"""
+    with _lock:
+        clients = list(_async_clients.pop(asyncio.get_running_loop(), {}).values())
+    for client, _ in clients:
+        await client.close()
+    close_clients()
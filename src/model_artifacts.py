@@ -0,0 +1,178 @@
+# Model artifact manager: export models at build time, load them offline with checksums
+import os
+import sys
+import json
+import time
+import hashlib
+import logging
+import argparse
+import threading
+
+try:
+    from .embedding import EMBEDDING_MODEL_NAME, EMBEDDING_BACKEND, OnnxSentenceEncoder
+except ImportError:
+    from embedding import EMBEDDING_MODEL_NAME, EMBEDDING_BACKEND, OnnxSentenceEncoder
+
+logger = logging.getLogger(__name__)
+
+# Empty keeps loading models from the Hugging Face hub (previous behaviour)
+MODEL_ARTIFACT_DIR = os.getenv('MODEL_ARTIFACT_DIR', '')
+# Bump to export a fresh artifact set next to the old one
+MODEL_ARTIFACT_VERSION = os.getenv('MODEL_ARTIFACT_VERSION', '1')
+MODEL_ARTIFACT_VERIFY = os.getenv('MODEL_ARTIFACT_VERIFY', '1') == '1'
+NER_MODEL_NAME = 'dslim/bert-base-NER'
+
+MANIFEST_NAME = 'manifest.json'
+_HASH_BLOCK = 4 * 1024 * 1024
+
+_verified = {}
+_verify_lock = threading.Lock()
+
+
+def _format_for_backend(backend):
+    """Serialized format an embedding backend loads from"""
+    return backend if backend.startswith('onnx') else 'sentence-transformers'
+
+
+def artifact_root(base_dir=None, version=None):
+    return os.path.join(base_dir or MODEL_ARTIFACT_DIR, f"v{version or MODEL_ARTIFACT_VERSION}")
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(_HASH_BLOCK), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _checksums(model_dir):
+    checksums = {}
+    for dirpath, _, filenames in os.walk(model_dir):
+        for filename in sorted(filenames):
+            path = os.path.join(dirpath, filename)
+            checksums[os.path.relpath(path, model_dir).replace(os.sep, '/')] = _sha256(path)
+    return checksums
+
+
+def enable_offline_mode():
+    """Stop transformers / huggingface_hub from contacting the hub (must run before they are imported)"""
+    os.environ.setdefault('HF_HUB_OFFLINE', '1')
+    os.environ.setdefault('TRANSFORMERS_OFFLINE', '1')
+
+
+def export_models(base_dir=None, backend=EMBEDDING_BACKEND, embedding_model=EMBEDDING_MODEL_NAME,
+                  include_ner=False):
+    """
+    Download and serialize the configured models into <base_dir>/v<version>.
+
+    The embedding model is saved in the format its backend loads (a
+    SentenceTransformers directory, or an exported - and for onnx-int8,
+    quantized - ONNX graph). A manifest records the source model and a
+    SHA-256 for every file.
+    """
+    root = artifact_root(base_dir)
+    os.makedirs(root, exist_ok=True)
+    manifest = {'version': MODEL_ARTIFACT_VERSION, 'created': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+                'models': {}}
+
+    embedding_dir = os.path.join(root, 'embedding')
+    artifact_format = _format_for_backend(backend)
+    logger.info(f"Exporting {embedding_model} ({artifact_format}) to {embedding_dir}...")
+    if artifact_format.startswith('onnx'):
+        OnnxSentenceEncoder(embedding_model, quantize=backend == 'onnx-int8', export_dir=embedding_dir)
+    else:
+        from sentence_transformers import SentenceTransformer
+        SentenceTransformer(embedding_model).save(embedding_dir)
+    manifest['models']['embedding'] = {'source': embedding_model, 'format': artifact_format, 'path': 'embedding'}
+
+    if include_ner:
+        from transformers import pipeline
+        ner_dir = os.path.join(root, 'ner')
+        logger.info(f"Exporting {NER_MODEL_NAME} to {ner_dir}...")
+        pipeline("ner", model=NER_MODEL_NAME).save_pretrained(ner_dir)
+        manifest['models']['ner'] = {'source': NER_MODEL_NAME, 'format': 'transformers', 'path': 'ner'}
+
+    for entry in manifest['models'].values():
+        entry['files'] = _checksums(os.path.join(root, entry['path']))
+    with open(os.path.join(root, MANIFEST_NAME), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    logger.info(f"Wrote model manifest {os.path.join(root, MANIFEST_NAME)}")
+    return manifest
+
+
+def load_manifest(base_dir=None):
+    path = os.path.join(artifact_root(base_dir), MANIFEST_NAME)
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        raise Exception(f"No model manifest at {path}; run 'python src/model_artifacts.py export' first")
+
+
+def verify_model(entry, root):
+    """Check every file of an exported model against its manifest checksum"""
+    model_dir = os.path.join(root, entry['path'])
+    for relpath, expected in entry['files'].items():
+        path = os.path.join(model_dir, relpath)
+        if not os.path.exists(path):
+            raise Exception(f"Model artifact file missing: {path}")
+        if _sha256(path) != expected:
+            raise Exception(f"Checksum mismatch for model artifact {path}")
+
+
+def resolve_model_path(kind, source, artifact_format):
+    """
+    Local directory of an exported model, or None when MODEL_ARTIFACT_DIR is unset.
+
+    With an artifact directory configured, loading is strict: the model must
+    be in the manifest with the expected source and format, and its files
+    must match their checksums (verified once per process).
+    """
+    if not MODEL_ARTIFACT_DIR:
+        return None
+    root = artifact_root()
+    entry = load_manifest().get('models', {}).get(kind)
+    if entry is None:
+        raise Exception(f"Model '{kind}' was not exported to {root}")
+    if entry['source'] != source or entry['format'] != artifact_format:
+        raise Exception(f"Exported {kind} model is {entry['source']} ({entry['format']}), "
+                        f"but {source} ({artifact_format}) is configured")
+    if MODEL_ARTIFACT_VERIFY:
+        with _verify_lock:
+            if not _verified.get(kind):
+                start = time.time()
+                verify_model(entry, root)
+                _verified[kind] = True
+                logger.info(f"Verified {len(entry['files'])} {kind} model files in {time.time() - start:.1f}s")
+    return os.path.join(root, entry['path'])
+
+
+def embedding_model_path(backend=EMBEDDING_BACKEND, embedding_model=EMBEDDING_MODEL_NAME):
+    return resolve_model_path('embedding', embedding_model, _format_for_backend(backend))
+
+
+def ner_model_path():
+    return resolve_model_path('ner', NER_MODEL_NAME, 'transformers')
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Export or verify local model artifacts")
+    parser.add_argument('command', choices=['export', 'verify'])
+    parser.add_argument('--dir', default=MODEL_ARTIFACT_DIR or 'models', help="artifact base directory")
+    parser.add_argument('--ner', action='store_true', default=os.getenv('QUERY_PARSER_MODE', 'rules') == 'ner',
+                        help="also export the NER model (default: only when QUERY_PARSER_MODE=ner)")
+    args = parser.parse_args()
+
+    if args.command == 'export':
+        export_models(args.dir, include_ner=args.ner)
+    else:
+        root = artifact_root(args.dir)
+        for kind, entry in load_manifest(args.dir)['models'].items():
+            try:
+                verify_model(entry, root)
+                print(f"✅ {kind}: {entry['source']} ({entry['format']}), {len(entry['files'])} files OK")
+            except Exception as e:
+                print(f"❌ {kind}: {e}")
+                sys.exit(1)
@@ -0,0 +1,136 @@
+# Overlapped extract -> chunk -> embed pipeline
+import os
+import queue
+import logging
+import threading
+
+import numpy as np
+
+try:
+    from .chunking import Chunker
+    from .dedup import ChunkDeduplicator
+    from .embedding_store import encode_chunks
+    from .vector_index import build_index
+except ImportError:
+    from chunking import Chunker
+    from dedup import ChunkDeduplicator
+    from embedding_store import encode_chunks
+    from vector_index import build_index
+
+logger = logging.getLogger(__name__)
+
+# Chunks handed to the encoder per call; the pipeline starts encoding as soon as one fills.
+# Each call is length-sorted and split into EMBED_BATCH_SIZE model batches (see embedding.py)
+PIPELINE_EMBED_BATCH = int(os.getenv('PIPELINE_EMBED_BATCH', 128))
+PIPELINE_QUEUE_SIZE = 4  # Batches buffered ahead of the encoder
+
+_END = object()
+
+
+def _put(out_queue, item, stop):
+    """Blocking put that gives up once the consumer has stopped listening"""
+    while not stop.is_set():
+        try:
+            out_queue.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _produce_chunk_batches(page_batches, out_queue, batch_size, stop, extracted):
+    """Producer thread: extract pages, chunk them and queue batches for the encoder"""
+    try:
+        chunker = Chunker()
+        pending = []
+        for pages in page_batches:
+            for page_text in pages:
+                extracted['pages'].append(page_text)
+                pending.extend(chunker.feed(page_text))
+            while len(pending) >= batch_size:
+                if not _put(out_queue, pending[:batch_size], stop):
+                    return
+                pending = pending[batch_size:]
+        pending.extend(chunker.finish())
+        if chunker.dropped:
+            logger.info(f"Skipped {chunker.dropped} chunks below the minimum token count")
+        if pending and not _put(out_queue, pending, stop):
+            return
+        _put(out_queue, _END, stop)
+    except BaseException as e:
+        _put(out_queue, e, stop)
+
+
+def embed_page_stream(page_batches, model, batch_size=PIPELINE_EMBED_BATCH, on_extracted=None,
+                      deduplicator=None):
+    """
+    Chunk and embed a stream of page batches, overlapping the phases.
+
+    page_batches is an iterable of lists of page texts (in document order).
+    Extraction and chunking run on a producer thread while the calling thread
+    encodes full batches as they arrive. Repeated chunks are collapsed by the
+    deduplicator before encoding, so only representatives are returned, and
+    chunks already in the embedding store are looked up instead of encoded.
+    Returns (chunks, embeddings, index, model) like create_document_embeddings.
+    If given, on_extracted(pages, spans) is called with the page texts and the
+    offsets of every chunk (duplicates included) once everything is chunked.
+    """
+    dedup = deduplicator or ChunkDeduplicator()
+    batches = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+    stop = threading.Event()
+    extracted = {'pages': []}
+    producer = threading.Thread(
+        target=_produce_chunk_batches,
+        args=(page_batches, batches, batch_size, stop, extracted),
+        name="chunk-producer",
+        daemon=True
+    )
+    producer.start()
+
+    chunks = []
+    spans = []
+    embedded = []
+    try:
+        while True:
+            item = batches.get()
+            if item is _END:
+                break
+            if isinstance(item, BaseException):
+                raise item
+            spans.extend((start, end) for start, end, _ in item)
+            batch = [chunk for _, _, chunk in item if dedup.add(chunk)]
+            if not batch:
+                continue
+            embedded.append(encode_chunks(model, batch))
+            chunks.extend(batch)
+            logger.debug(f"Encoded batch of {len(item)} chunks ({len(chunks)} total)")
+    finally:
+        # Unblock the producer if we are bailing out early
+        stop.set()
+        producer.join()
+
+    logger.info(f"Encoded {len(chunks)} chunks in {len(embedded)} pipelined batches "
+                f"({dedup.duplicates} duplicates collapsed)")
+    if on_extracted is not None:
+        on_extracted(extracted['pages'], spans)
+    return _build_index(chunks, embedded, model)
+
+
+def embed_chunks(chunks, model, deduplicator=None):
+    """Embed already-chunked text (e.g. chunks reused after a 304 Not Modified)"""
+    dedup = deduplicator or ChunkDeduplicator()
+    unique = [chunk for chunk in chunks if dedup.add(chunk)]
+    # Everything is available up front, so sort and batch across the whole document
+    embedded = [encode_chunks(model, unique)] if unique else []
+    if dedup.duplicates:
+        logger.info(f"Collapsed {dedup.duplicates} duplicate chunks before encoding")
+    return _build_index(unique, embedded, model)
+
+
+def _build_index(chunks, embedded, model):
+    if not chunks:
+        raise Exception("No text chunks could be extracted from the document")
+
+    # Compact storage modes keep the vectors only inside the index (embeddings is None)
+    index, embeddings = build_index(np.vstack(embedded))
+    return chunks, embeddings, index, model
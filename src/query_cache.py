@@ -0,0 +1,97 @@
+# Process-wide LRU cache of query embeddings
+import os
+import logging
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+QUERY_CACHE_SIZE = int(os.getenv('QUERY_CACHE_SIZE', 4096))  # 0 disables the cache
+
+
+def normalize_query(text):
+    """Whitespace-insensitive form of a question (the tokenizer ignores whitespace differences)"""
+    return " ".join(text.split())
+
+
+class QueryEmbeddingCache:
+    """
+    Bounded LRU of query vectors keyed by (embedding model, normalized text).
+
+    The same question sets are asked against many documents, so repeated
+    questions skip the encoder entirely.
+    """
+
+    def __init__(self, max_size=QUERY_CACHE_SIZE):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _model_key(model):
+        return getattr(model, 'embedding_key', None) or f"{type(model).__name__}@{id(model):x}"
+
+    def encode(self, model, queries):
+        """Return a float32 (len(queries), dim) array, encoding only uncached queries"""
+        model_key = self._model_key(model)
+        keys = [(model_key, normalize_query(query)) for query in queries]
+        vectors = [None] * len(keys)
+        missing = {}
+        with self._lock:
+            for i, key in enumerate(keys):
+                vector = self._entries.get(key)
+                if vector is not None:
+                    self._entries.move_to_end(key)
+                    vectors[i] = vector
+                    self.hits += 1
+                else:
+                    missing.setdefault(key, []).append(i)
+                    self.misses += 1
+
+        if missing:
+            texts = [key[1] for key in missing]
+            encoded = np.asarray(model.encode(texts), dtype=np.float32)
+            with self._lock:
+                for (key, positions), vector in zip(missing.items(), encoded):
+                    vector = vector.copy()
+                    vector.setflags(write=False)
+                    for i in positions:
+                        vectors[i] = vector
+                    if self.max_size > 0:
+                        self._entries[key] = vector
+                        self._entries.move_to_end(key)
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+        return np.vstack(vectors)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+
+_query_cache = QueryEmbeddingCache()
+
+
+def encode_queries(model, queries):
+    """Encode questions through the shared query-embedding cache"""
+    return _query_cache.encode(model, queries)
+
+
+def query_cache_stats():
+    return _query_cache.stats()
@@ -0,0 +1,73 @@
+# Query feature extraction with a compiled rule matcher
+import os
+import re
+import json
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# rules: compiled phrase/regex matcher only | ner: rules plus the BERT NER pipeline (opt-in)
+QUERY_PARSER_MODE = os.getenv('QUERY_PARSER_MODE', 'rules').lower()
+QUERY_RULES_PATH = os.getenv('QUERY_RULES_PATH',
+                             os.path.join(os.path.dirname(os.path.abspath(__file__)), 'query_rules.json'))
+
+
+class QueryRuleMatcher:
+    """
+    Matches the rules with one compiled, case-insensitive regex per field.
+
+    Fields are matched independently, so overlapping phrases of different
+    fields never hide each other. Within a field, each rule is a named
+    lookahead alternative anchored at the start of the text; alternatives are
+    tried in order, so the first listed rule that occurs anywhere wins and
+    its group is read from match.lastgroup. Phrases are literal substrings;
+    patterns are regular expressions.
+    """
+
+    def __init__(self, rules):
+        self.fields = []
+        self._targets = {}
+        alternatives = {}
+        for i, rule in enumerate(rules):
+            field = rule['field']
+            if field not in self.fields:
+                self.fields.append(field)
+            parts = [re.escape(phrase) for phrase in rule.get('phrases', [])]
+            parts += [f"(?:{pattern})" for pattern in rule.get('patterns', [])]
+            if not parts:
+                continue
+            group = f"r{i}"
+            self._targets[group] = rule['value']
+            alternatives.setdefault(field, []).append(f"(?=.*?(?P<{group}>{'|'.join(parts)}))")
+        self._regexes = {field: re.compile("|".join(parts), re.IGNORECASE | re.DOTALL)
+                         for field, parts in alternatives.items()}
+
+    def match(self, text):
+        parsed = dict.fromkeys(self.fields)
+        for field, regex in self._regexes.items():
+            match = regex.match(text)
+            if match is not None:
+                parsed[field] = self._targets[match.lastgroup]
+        return parsed
+
+
+def load_query_rules(path=QUERY_RULES_PATH):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)['rules']
+
+
+_matcher = None
+_matcher_lock = threading.Lock()
+
+
+def get_query_matcher():
+    """Get the shared rule matcher, compiled from the rules file on first use"""
+    global _matcher
+    if _matcher is None:
+        with _matcher_lock:
+            if _matcher is None:
+                rules = load_query_rules()
+                _matcher = QueryRuleMatcher(rules)
+                logger.info(f"Compiled {len(rules)} query rules from {QUERY_RULES_PATH}")
+    return _matcher
@@ -0,0 +1,145 @@
+# Persistent LLM response cache keyed by model + prompt fingerprint
+import os
+import json
+import time
+import hashlib
+import logging
+import sqlite3
+import threading
+
+try:
+    from .embedding_store import chunk_hash
+except ImportError:
+    from embedding_store import chunk_hash
+
+logger = logging.getLogger(__name__)
+
+# Empty disables the cache
+LLM_CACHE_PATH = os.getenv('LLM_CACHE_PATH', os.path.join('cache', 'llm_responses.sqlite3'))
+LLM_CACHE_TTL = int(os.getenv('LLM_CACHE_TTL', 7 * 24 * 3600))  # Seconds, 0 never expires
+LLM_CACHE_MAX_ENTRIES = int(os.getenv('LLM_CACHE_MAX_ENTRIES', 20000))
+# Requests carrying "<header>: bypass" skip the lookup (the fresh answer is still stored)
+LLM_CACHE_BYPASS_HEADER = 'X-LLM-Cache'
+
+
+def response_key(llm_model, messages, relevant_chunks, max_tokens):
+    """
+    Fingerprint of one completion request: model, system prompt, a hash of
+    the user prompt and the hashes of the excerpts it was built from.
+    """
+    system = "".join(m['content'] for m in messages if m['role'] == 'system')
+    user = "".join(m['content'] for m in messages if m['role'] != 'system')
+    fingerprint = json.dumps([
+        llm_model,
+        system,
+        hashlib.sha256(user.encode('utf-8')).hexdigest(),
+        [chunk_hash(chunk).hex() for chunk in relevant_chunks],
+        max_tokens
+    ])
+    return hashlib.sha256(fingerprint.encode('utf-8')).digest()
+
+
+class ResponseCache:
+    """
+    SQLite-backed map of request fingerprint -> raw model reply.
+
+    Entries expire after ttl seconds; beyond max_entries the least recently
+    used are evicted.
+    """
+
+    def __init__(self, path=LLM_CACHE_PATH, ttl=LLM_CACHE_TTL, max_entries=LLM_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key BLOB PRIMARY KEY, response TEXT NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+        self._conn.commit()
+        # Kept in memory so stats() never touches the database (approximate when workers share the file)
+        self.size = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def get(self, key):
+        """Cached reply for key, or None if absent or expired"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT response, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None or (self.ttl > 0 and now - row[1] > self.ttl):
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, key, response):
+        now = time.time()
+        with self._lock:
+            exists = self._conn.execute("SELECT 1 FROM responses WHERE key = ?", (key,)).fetchone() is not None
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, response, created, accessed) VALUES (?, ?, ?, ?)",
+                (key, response, now, now)
+            )
+            if not exists:
+                self.size += 1
+            if self.ttl > 0:
+                self.size -= self._conn.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl,)).rowcount
+            excess = self.size - self.max_entries
+            if excess > 0:
+                self.size -= self._conn.execute(
+                    "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY accessed LIMIT ?)",
+                    (excess,)
+                ).rowcount
+            self._conn.commit()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': self.size,
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache():
+    """Get the shared LLM response cache, or None when it is disabled or unavailable"""
+    global _cache
+    if _cache is None and LLM_CACHE_PATH:
+        with _cache_lock:
+            if _cache is None:
+                try:
+                    _cache = ResponseCache(LLM_CACHE_PATH)
+                    logger.info(f"LLM response cache opened at {LLM_CACHE_PATH}")
+                except Exception as e:
+                    logger.warning(f"LLM response cache disabled, could not open {LLM_CACHE_PATH}: {e}")
+                    _cache = False
+    return _cache or None
+
+
+def response_cache_stats():
+    """In-memory counters only; does not open the cache (safe for liveness probes)"""
+    if not _cache:
+        return {'enabled': bool(LLM_CACHE_PATH) and _cache is None, 'opened': False}
+    return _cache.stats()
@@ -0,0 +1,144 @@
+# Per-document semantic cache of answers, matched by question embedding similarity
+import os
+import logging
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+try:
+    from .embedding_store import chunk_hash
+    from .vector_index import normalize
+except ImportError:
+    from embedding_store import chunk_hash
+    from vector_index import normalize
+
+logger = logging.getLogger(__name__)
+
+# Minimum cosine similarity between a new question and a cached one
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv('SEMANTIC_CACHE_THRESHOLD', 0.92))
+SEMANTIC_CACHE_SIZE = int(os.getenv('SEMANTIC_CACHE_SIZE', 256))  # Answers per document, 0 disables the cache
+SEMANTIC_CACHE_DOCUMENTS = int(os.getenv('SEMANTIC_CACHE_DOCUMENTS', 64))
+
+
+class _DocumentAnswers:
+    """Normalized question vectors of one document with their chunk sets and answers"""
+
+    def __init__(self, dimension):
+        self.vectors = np.empty((0, dimension), dtype=np.float32)
+        self.entries = []  # (chunk set, answer), aligned with vectors
+
+
+class SemanticAnswerCache:
+    """
+    Answers keyed by question embedding, per document.
+
+    A question is served from the cache when a cached question on the same
+    document is within threshold cosine similarity and retrieved exactly the
+    same excerpts, so a paraphrase only reuses an answer built from the same
+    evidence. Documents are evicted least recently used first, and each keeps
+    its max_size most recent answers.
+    """
+
+    def __init__(self, threshold=SEMANTIC_CACHE_THRESHOLD, max_size=SEMANTIC_CACHE_SIZE,
+                 max_documents=SEMANTIC_CACHE_DOCUMENTS):
+        self.threshold = threshold
+        self.max_size = max_size
+        self.max_documents = max_documents
+        self.hits = 0
+        self.misses = 0
+        self.near_misses = 0  # Similar question found, but its excerpts differed
+        self._documents = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _chunk_set(relevant_chunks):
+        return frozenset(chunk_hash(chunk) for chunk in relevant_chunks)
+
+    def lookup(self, document_key, query_embeddings, excerpts):
+        """Cached answer (or None) for each question"""
+        answers = [None] * len(excerpts)
+        if self.max_size <= 0:
+            return answers
+        queries = normalize(np.array(np.atleast_2d(query_embeddings), dtype=np.float32))
+        with self._lock:
+            document = self._documents.get(document_key)
+            if document is not None:
+                self._documents.move_to_end(document_key)
+            for i, relevant_chunks in enumerate(excerpts):
+                if document is None or not document.entries:
+                    self.misses += 1
+                    continue
+                scores = document.vectors @ queries[i]
+                chunk_set = self._chunk_set(relevant_chunks)
+                candidates = np.flatnonzero(scores >= self.threshold)
+                for j in candidates[np.argsort(-scores[candidates])]:
+                    if document.entries[j][0] == chunk_set:
+                        answers[i] = document.entries[j][1]
+                        break
+                if answers[i] is not None:
+                    self.hits += 1
+                else:
+                    self.misses += 1
+                    if len(candidates):
+                        self.near_misses += 1
+        return answers
+
+    def store(self, document_key, query_embeddings, excerpts, answers):
+        """Remember answers; None entries are skipped"""
+        if self.max_size <= 0:
+            return
+        queries = normalize(np.array(np.atleast_2d(query_embeddings), dtype=np.float32))
+        keep = [i for i, answer in enumerate(answers) if answer is not None]
+        if not keep:
+            return
+        with self._lock:
+            document = self._documents.get(document_key)
+            if document is None:
+                document = self._documents[document_key] = _DocumentAnswers(queries.shape[1])
+            self._documents.move_to_end(document_key)
+            added = []
+            for i in keep:
+                chunk_set = self._chunk_set(excerpts[i])
+                # The same question answered again (e.g. with the cache bypassed) replaces its entry
+                same = [j for j in np.flatnonzero(document.vectors @ queries[i] >= 0.9999)
+                        if document.entries[j][0] == chunk_set]
+                if same:
+                    document.entries[same[0]] = (chunk_set, answers[i])
+                else:
+                    added.append((i, chunk_set))
+            if added:
+                document.vectors = np.vstack([document.vectors, queries[[i for i, _ in added]]])[-self.max_size:]
+                document.entries = (document.entries +
+                                    [(chunk_set, answers[i]) for i, chunk_set in added])[-self.max_size:]
+            while len(self._documents) > self.max_documents:
+                self._documents.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'documents': len(self._documents),
+                'answers': sum(len(document.entries) for document in self._documents.values()),
+                'threshold': self.threshold,
+                'hits': self.hits,
+                'misses': self.misses,
+                'near_misses': self.near_misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+    def clear(self):
+        with self._lock:
+            self._documents.clear()
+            self.hits = self.misses = self.near_misses = 0
+
+
+_semantic_cache = SemanticAnswerCache()
+
+
+def get_semantic_cache():
+    return _semantic_cache
+
+
+def semantic_cache_stats():
+    return _semantic_cache.stats()
@@ -0,0 +1,216 @@
+# Vector storage for document chunks: normalized, compact FAISS indexes chosen by corpus size
+import os
+import math
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# flat: fp32 IndexFlatL2 plus the raw embeddings array (previous behaviour)
+# fp16 / int8: L2-normalized vectors stored once in a scalar-quantized inner-product index
+VECTOR_STORAGE = os.getenv('VECTOR_STORAGE', 'fp16').lower()
+
+# auto | numpy | flat | hnsw | ivfpq (auto picks by vector count, see choose_index_type)
+INDEX_TYPE = os.getenv('INDEX_TYPE', 'auto').lower()
+INDEX_NUMPY_MAX = int(os.getenv('INDEX_NUMPY_MAX', 1000))
+INDEX_FLAT_MAX = int(os.getenv('INDEX_FLAT_MAX', 20000))
+INDEX_HNSW_MAX = int(os.getenv('INDEX_HNSW_MAX', 200000))
+
+# HNSW graph degree and build / search beam widths
+HNSW_M = int(os.getenv('HNSW_M', 32))
+HNSW_EF_CONSTRUCTION = int(os.getenv('HNSW_EF_CONSTRUCTION', 80))
+HNSW_EF_SEARCH = int(os.getenv('HNSW_EF_SEARCH', 64))
+# IVF-PQ: lists (0 = 4 * sqrt(n)), lists probed per query, bytes per vector, and how many
+# PQ candidates per result are re-scored with the fp16/int8 codes (0 = PQ scores only)
+IVF_NLIST = int(os.getenv('IVF_NLIST', 0))
+IVF_NPROBE = int(os.getenv('IVF_NPROBE', 16))
+PQ_BYTES = int(os.getenv('PQ_BYTES', 64))
+IVF_REFINE_FACTOR = int(os.getenv('IVF_REFINE_FACTOR', 16))
+
+# Storage mode -> faiss.ScalarQuantizer type (faiss is imported on first use to keep startup light)
+_QUANTIZERS = {
+    'fp16': 'QT_fp16',
+    'int8': 'QT_8bit',
+}
+
+
+def normalize(vectors):
+    """L2-normalize in place (after converting to contiguous float32 if needed) and return the array"""
+    import faiss
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    faiss.normalize_L2(vectors)
+    return vectors
+
+
+class NumpyIndex:
+    """
+    Brute-force inner-product search with one BLAS matmul.
+
+    Used for small documents, where the matmul beats FAISS call overhead.
+    Vectors are kept in the configured storage precision (fp16, or int8
+    codes with one scale per vector) and upcast to fp32 at query time.
+    Mirrors the parts of the FAISS index API used here (ntotal, d,
+    metric_type, add, search, reconstruct_n).
+    """
+
+    def __init__(self, dimension, storage='fp16'):
+        import faiss
+        self.d = dimension
+        self.metric_type = faiss.METRIC_INNER_PRODUCT
+        self.storage = storage
+        self.vectors = np.zeros((0, dimension), dtype=np.int8 if storage == 'int8' else np.float16)
+        self.scales = np.zeros(0, dtype=np.float32) if storage == 'int8' else None
+
+    @classmethod
+    def from_vectors(cls, vectors, scales=None):
+        """
+        Wrap stored vectors (e.g. read-only memory-mapped arrays) without
+        copying: int8 codes with their per-vector scales, or float vectors.
+        """
+        index = cls(vectors.shape[1], 'int8' if scales is not None else 'fp16')
+        index.vectors = vectors
+        index.scales = scales
+        return index
+
+    @property
+    def ntotal(self):
+        return len(self.vectors)
+
+    def add(self, vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if self.scales is not None:
+            # Normalized components lie in [-1, 1]; scale each vector so its largest one maps to 127
+            scales = np.maximum(np.abs(vectors).max(axis=1), 1e-12) / 127
+            codes = np.rint(vectors / scales[:, None]).astype(np.int8)
+            self.vectors = np.vstack([self.vectors, codes])
+            self.scales = np.concatenate([self.scales, scales.astype(np.float32)])
+        else:
+            self.vectors = np.vstack([self.vectors, vectors.astype(self.vectors.dtype)])
+
+    def _decode(self, start=0, stop=None):
+        vectors = self.vectors[start:stop].astype(np.float32)
+        if self.scales is not None:
+            vectors *= self.scales[start:stop, None]
+        return vectors
+
+    def search(self, queries, k):
+        if self.scales is not None:
+            scores = (queries @ self.vectors.T.astype(np.float32)) * self.scales
+        else:
+            scores = queries @ self.vectors.T.astype(np.float32)
+        k = min(k, self.ntotal)
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind='stable')
+        return np.take_along_axis(top_scores, order, axis=1), np.take_along_axis(top, order, axis=1)
+
+    def reconstruct_n(self, start, count):
+        return self._decode(start, start + count)
+
+
+def choose_index_type(count, index_type=INDEX_TYPE):
+    """Index structure for a corpus of count vectors"""
+    if index_type != 'auto':
+        return index_type
+    if count <= INDEX_NUMPY_MAX:
+        return 'numpy'
+    if count <= INDEX_FLAT_MAX:
+        return 'flat'
+    if count <= INDEX_HNSW_MAX:
+        return 'hnsw'
+    return 'ivfpq'
+
+
+def _pq_subquantizers(dimension, pq_bytes):
+    """Largest divisor of dimension not above pq_bytes (8-bit codes, one byte per subquantizer)"""
+    return max(m for m in range(1, min(pq_bytes, dimension) + 1) if dimension % m == 0)
+
+
+def build_index(embeddings, storage=VECTOR_STORAGE, index_type=INDEX_TYPE):
+    """
+    Build the search index for a document's chunk embeddings.
+
+    Returns (index, embeddings). In the compact modes the vectors live only
+    inside the index and embeddings is None; reconstruct_embeddings can
+    recover approximate vectors when needed. The index structure (NumPy
+    brute force, flat scan, HNSW or IVF-PQ) follows choose_index_type.
+    """
+    import faiss
+    count, dimension = embeddings.shape
+    if storage == 'flat':
+        index = faiss.IndexFlatL2(dimension)
+        index.add(embeddings)
+        return index, embeddings
+    if storage not in _QUANTIZERS:
+        raise ValueError(f"Unknown VECTOR_STORAGE '{storage}' (expected flat, fp16 or int8)")
+
+    vectors = normalize(embeddings)
+    kind = choose_index_type(count, index_type)
+    qtype = getattr(faiss.ScalarQuantizer, _QUANTIZERS[storage])
+    if kind == 'numpy':
+        index = NumpyIndex(dimension, storage)
+    elif kind == 'flat':
+        index = faiss.IndexScalarQuantizer(dimension, qtype, faiss.METRIC_INNER_PRODUCT)
+    elif kind == 'hnsw':
+        index = faiss.IndexHNSWSQ(dimension, qtype, HNSW_M, faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+    elif kind == 'ivfpq':
+        nlist = IVF_NLIST or max(1, int(4 * math.sqrt(count)))
+        # k-means wants ~39 training points per list
+        nlist = min(nlist, max(1, count // 39))
+        index = faiss.IndexIVFPQ(faiss.IndexFlatIP(dimension), dimension, nlist,
+                                 _pq_subquantizers(dimension, PQ_BYTES), 8, faiss.METRIC_INNER_PRODUCT)
+        if IVF_REFINE_FACTOR > 0:
+            # PQ alone loses too much recall on 1024-d embeddings; re-rank its shortlist
+            index = faiss.IndexRefine(index, faiss.IndexScalarQuantizer(dimension, qtype,
+                                                                        faiss.METRIC_INNER_PRODUCT))
+    else:
+        raise ValueError(f"Unknown INDEX_TYPE '{kind}' (expected auto, numpy, flat, hnsw or ivfpq)")
+
+    if not getattr(index, 'is_trained', True):
+        index.train(vectors)
+    index.add(vectors)
+    if kind == 'ivfpq' and IVF_REFINE_FACTOR <= 0:
+        index.make_direct_map()  # Lets reconstruct_embeddings decode by id
+    set_search_params(index)
+    logger.info(f"Built {kind} index over {count} vectors ({storage} storage)")
+    return index, None
+
+
+def set_search_params(index, nprobe=IVF_NPROBE, ef_search=HNSW_EF_SEARCH, refine_factor=IVF_REFINE_FACTOR):
+    """Apply the recall / latency knobs of approximate indexes (no-op for exact ones)"""
+    import faiss
+    if isinstance(index, faiss.IndexRefine):
+        index.k_factor = refine_factor
+        index = faiss.downcast_index(index.base_index)
+    if hasattr(index, 'hnsw'):
+        index.hnsw.efSearch = ef_search
+    if hasattr(index, 'nprobe'):
+        index.nprobe = nprobe
+
+
+def search(index, query_embeddings, k):
+    """Search with a batch of query vectors, normalizing them for inner-product indexes"""
+    import faiss
+    queries = np.ascontiguousarray(np.atleast_2d(query_embeddings), dtype=np.float32)
+    if index.metric_type == faiss.METRIC_INNER_PRODUCT:
+        queries = normalize(queries.copy())
+    return index.search(queries, min(k, index.ntotal))
+
+
+def reconstruct_embeddings(index):
+    """Decode every stored vector (approximate for quantized indexes)"""
+    return index.reconstruct_n(0, index.ntotal)
+
+
+def index_memory_bytes(index, embeddings=None):
+    """Approximate resident size of an index plus any raw embeddings kept beside it"""
+    import faiss
+    if isinstance(index, NumpyIndex):
+        size = index.vectors.nbytes + (index.scales.nbytes if index.scales is not None else 0)
+    else:
+        size = len(faiss.serialize_index(index))
+    if embeddings is not None:
+        size += embeddings.nbytes
+    return size
@@ -3,10 +3,9 @@ from werkzeug.utils import secure_filename
 import os
 import json
 import sys
-import tempfile
 import traceback
 import time
-import gc
+import threading
 import secrets
 import logging
 
@@ -26,21 +25,21 @@ def import_app_module():
     """Dynamic import handler for app.py that works in all environments"""
     try:
         # Method 1: Try relative import (when running as package)
-        from .app import extract_text_from_pdf, create_document_embeddings, generate_response
-        return extract_text_from_pdf, create_document_embeddings, generate_response
+        from .app import extract_text_from_pdf, create_document_embeddings, generate_response, query_cache_stats, warm_up_llm_client
+        return extract_text_from_pdf, create_document_embeddings, generate_response, query_cache_stats, warm_up_llm_client
     except (ImportError, ValueError):
         try:
             # Method 2: Try direct import (when running standalone)
-            from app import extract_text_from_pdf, create_document_embeddings, generate_response
-            return extract_text_from_pdf, create_document_embeddings, generate_response
+            from app import extract_text_from_pdf, create_document_embeddings, generate_response, query_cache_stats, warm_up_llm_client
+            return extract_text_from_pdf, create_document_embeddings, generate_response, query_cache_stats, warm_up_llm_client
         except ImportError:
             try:
                 # Method 3: Add current directory to path and import
                 current_dir = os.path.dirname(os.path.abspath(__file__))
                 if current_dir not in sys.path:
                     sys.path.insert(0, current_dir)
-                from app import extract_text_from_pdf, create_document_embeddings, generate_response
-                return extract_text_from_pdf, create_document_embeddings, generate_response
+                from app import extract_text_from_pdf, create_document_embeddings, generate_response, query_cache_stats, warm_up_llm_client
+                return extract_text_from_pdf, create_document_embeddings, generate_response, query_cache_stats, warm_up_llm_client
             except ImportError:
                 # Method 4: Absolute path import (fallback)
                 import importlib.util
@@ -54,11 +53,13 @@ def import_app_module():
                 
                 return (app_module.extract_text_from_pdf, 
                        app_module.create_document_embeddings, 
-                       app_module.generate_response)
+                       app_module.generate_response,
+                       app_module.query_cache_stats,
+                       app_module.warm_up_llm_client)
 
 # Import the required functions
 try:
-    extract_text_from_pdf, create_document_embeddings, generate_response = import_app_module()
+    extract_text_from_pdf, create_document_embeddings, generate_response, query_cache_stats, warm_up_llm_client = import_app_module()
     logger.info("Successfully imported app module functions")
 except Exception as import_error:
     logger.error(f"Failed to import app module: {import_error}")
@@ -111,6 +112,9 @@ if not validate_api_configuration():
     logger.info("HINT: Create a .env file with:")
     logger.info("OPENROUTER_API_KEY=your_actual_api_key_here")
     logger.info("Application will continue but AI features may not work")
+else:
+    # Open the pooled LLM API connection in the background so the first question skips the handshake
+    threading.Thread(target=warm_up_llm_client, args=(get_api_key()[0],), name="llm-warm-up", daemon=True).start()
 
 app = Flask(__name__)
 
@@ -883,63 +887,31 @@ def upload_file():
             'chunk_count': 0
         })
         
-        # Save file to temporary location and process it
-        temp_file_path = None
-        try:
-            # Create temporary file
-            temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.pdf')
-            temp_file_path = temp_file.name
-            
-            # Save the uploaded file
-            file.save(temp_file_path)
-            temp_file.close()  # Explicitly close the file
-            
-            # Add a small delay to ensure file is released
-            time.sleep(0.1)
-            gc.collect()  # Force garbage collection
-            
-            logger.info(f"Processing new PDF: {file.filename}")
-            
-            # Process the PDF (file is now closed and released)
-            text = extract_text_from_pdf(temp_file_path)
-            chunks, embeddings, index, model_st = create_document_embeddings(text)
-            
-            # Store in global variables
-            current_document.update({
-                'chunks': chunks,
-                'embeddings': embeddings,
-                'index': index,
-                'model_st': model_st,
-                'filename': secure_filename(file.filename),
-                'upload_time': time.strftime('%H:%M:%S'),
-                'chunk_count': len(chunks)
-            })
-            
-            logger.info(f"Successfully processed PDF: {file.filename} with {len(chunks)} chunks")
-            
-            flash(f'✅ PDF "{file.filename}" uploaded and processed successfully! Ready for AI analysis with {len(chunks)} text sections.')
-            return redirect(url_for('index'))
-            
-        finally:
-            # Clean up temp file safely with retry mechanism
-            if temp_file_path and os.path.exists(temp_file_path):
-                max_retries = 5
-                for attempt in range(max_retries):
-                    try:
-                        time.sleep(0.1 * (attempt + 1))  # Increasing delay
-                        os.unlink(temp_file_path)
-                        break  # Success, exit retry loop
-                    except PermissionError as e:
-                        if attempt == max_retries - 1:
-                            logger.warning(f"Could not delete temp file after {max_retries} attempts: {temp_file_path}")
-                            # File will be cleaned up by system temp folder cleanup
-                        else:
-                            logger.debug(f"Retry {attempt + 1}/{max_retries} to delete temp file: {e}")
-                            gc.collect()  # Force garbage collection between retries
-                    except Exception as cleanup_error:
-                        logger.warning(f"Unexpected error deleting temp file {temp_file_path}: {cleanup_error}")
-                        break
-        
+        # Read the upload into memory (bounded by MAX_CONTENT_LENGTH) and
+        # hand the buffer straight to the extractor - no temp file round trip
+        pdf_bytes = file.read()
+        logger.info(f"Processing new PDF: {file.filename} ({len(pdf_bytes)} bytes)")
+
+        text = extract_text_from_pdf(pdf_bytes)
+        del pdf_bytes
+        chunks, embeddings, index, model_st = create_document_embeddings(text)
+
+        # Store in global variables
+        current_document.update({
+            'chunks': chunks,
+            'embeddings': embeddings,
+            'index': index,
+            'model_st': model_st,
+            'filename': secure_filename(file.filename),
+            'upload_time': time.strftime('%H:%M:%S'),
+            'chunk_count': len(chunks)
+        })
+
+        logger.info(f"Successfully processed PDF: {file.filename} with {len(chunks)} chunks")
+
+        flash(f'✅ PDF "{file.filename}" uploaded and processed successfully! Ready for AI analysis with {len(chunks)} text sections.')
+        return redirect(url_for('index'))
+
     except Exception as e:
         flash(f'❌ Error processing file: {str(e)}')
         logger.error(f"Upload error: {traceback.format_exc()}")
@@ -1052,7 +1024,8 @@ def get_status():
         'api_configured': api_key is not None,
         'api_key_source': key_source,
         'api_key_preview': f"{api_key[:8]}..." if api_key else None,
-        'system_ready': api_key is not None and current_document['chunks'] is not None
+        'system_ready': api_key is not None and current_document['chunks'] is not None,
+        'query_embedding_cache': query_cache_stats()
     })
 
 @app.route('/test-api')